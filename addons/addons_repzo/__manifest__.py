@@ -1,11 +1,14 @@
 {
     'name': 'Repzo Endpoint',
-    'version': '1.1',
+    'version': '1.2',
     'author': 'AbdElwahapBak',
     'category': 'EndPoint',
     'summary': 'API Endpoint for Repzo',
-    'depends': ['base', 'contacts', 'account', 'sale'],
-    'data': [],
+    'depends': ['base', 'contacts', 'account', 'sale', 'sale_stock'],
+    'data': [
+        'security/ir.model.access.csv',
+        'data/ir_cron.xml',
+    ],
     'installable': True,
     'auto_install': False,
     'application': False,
@@ -4,9 +4,15 @@ from marshmallow import ValidationError
 import json
 import logging
 from .marshmallow.ProductValidation import BrandSchema
+from .serializers import brand_serializer
+from .bulk import load_many, upsert_by_key
+from .http_cache import not_modified
 
 _logger = logging.getLogger(__name__)
 
+# database -> (brand list version, serialized brands), kept by each worker
+_brands_cache = {}
+
 
 class BrandEndpoint(http.Controller):
     def __init__(self):
@@ -16,16 +22,17 @@ class BrandEndpoint(http.Controller):
     @http.route('/api/get_all_brands', type='json', auth='none', methods=['GET'])
     def get_all_brands(self):
         try:
-            brands = request.env['product.brand'].sudo().search([])
-            brands_data = [{
-                "id": brand.id,
-                "_id": brand._id,
-                "name": brand.name or "",
-                "company_namespace": [company.name for company in brand.company_namespace],
-                "createdAt": brand.create_date.isoformat() if brand.create_date else None,
-                "updatedAt": brand.write_date.isoformat() if brand.write_date else None,
-
-            } for brand in brands]
+            Brand = request.env['product.brand'].sudo()
+            version = Brand._list_version()
+            if not_modified(version):
+                return {}
+
+            # Rebuilt once per version, company names read in one query
+            cached = _brands_cache.get(request.env.cr.dbname)
+            if not cached or cached[0] != version:
+                cached = _brands_cache[request.env.cr.dbname] = (
+                    version, brand_serializer.dump(Brand.search([])))
+            brands_data = cached[1]
 
             return {
                 "status": "success",
@@ -42,14 +49,7 @@ class BrandEndpoint(http.Controller):
             if not brand.exists():
                 return {"status": "error", "message": "Brand not found."}
 
-            brand_data = {
-                "id": brand.id,
-                "name": brand.name or "",
-                "company_namespace": [company.name for company in brand.company_namespace],
-                "createdAt": brand.create_date.isoformat() if brand.create_date else None,
-                "updatedAt": brand.write_date.isoformat() if brand.write_date else None,
-
-            }
+            brand_data = brand_serializer.dump_one(brand)
 
             return {"status": "success", "data": brand_data}
 
@@ -87,6 +87,31 @@ class BrandEndpoint(http.Controller):
         except Exception as e:
             return {"status": "error", "message": str(e)}
 
+    @http.route('/api/brands/bulk', type='json', auth='none', methods=['POST'])
+    def bulk_upsert_brands(self):
+        try:
+            data = json.loads(request.httprequest.data.decode('utf-8'))
+            items, errors = load_many(BrandSchema(many=True), data)
+
+            # Matched on Repzo's `_id`
+            results = upsert_by_key(
+                request.env['product.brand'].sudo(), '_id',
+                {index: item for index, item in enumerate(items) if item is not None},
+                lambda item: {
+                    '_id': item['_id'],
+                    'name': item['name'],
+                    'disabled': item.get('disabled', False),
+                })
+            results.update({index: {"index": index, "status": "error", "errors": messages}
+                            for index, messages in errors.items()})
+
+            return {"status": "success", "results": [results[index] for index in range(len(items))]}
+
+        except ValidationError as err:
+            return {"status": "error", "errors": err.messages}
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
     @http.route('/api/update_brand/<int:brand_id>', type='json', auth='none', methods=['PUT'])
     def update_brand(self, brand_id):
         try:
@@ -0,0 +1,134 @@
+from collections import Counter, defaultdict
+from marshmallow import ValidationError
+import json
+
+
+def load_many(schema, data):
+    """Validate a list payload with a ``many=True`` schema.
+
+    Returns ``(items, errors)`` where ``items`` holds the loaded data of each
+    row (``None`` for invalid rows) and ``errors`` the messages by row index,
+    so one bad row does not reject the whole batch.
+    """
+    if not isinstance(data, list):
+        raise ValidationError({"_schema": ["Expected a list of items."]})
+    try:
+        return schema.load(data), {}
+    except ValidationError as err:
+        errors = err.messages if isinstance(err.messages, dict) else {}
+        items = [
+            None if index in errors else item
+            for index, item in enumerate(err.valid_data or [])
+        ]
+        return items, errors
+
+
+def check_references(env, valid, references, errors):
+    """Reject the rows of ``valid`` referencing unknown records.
+
+    ``references`` holds ``(field, model, get_ids)`` triplets, ``get_ids``
+    giving the ids of ``model`` a row refers to through ``field``; each
+    model costs one query. Rejected rows move from ``valid`` to ``errors``.
+    """
+    for field, model, get_ids in references:
+        wanted = {id_ for item in valid.values() for id_ in get_ids(item)}
+        known = set(env[model].search([('id', 'in', list(wanted))]).ids)
+        for index, item in list(valid.items()):
+            missing = set(get_ids(item)) - known
+            if missing:
+                errors[index] = {field: ["Unknown id(s): %s." % sorted(missing)]}
+                del valid[index]
+
+
+def created_results(size, created, errors, to_result):
+    """Result of each of the ``size`` rows: ``to_result(record)`` for the
+    ``created`` ones, their ``errors`` for the others."""
+    results = []
+    for index in range(size):
+        if index in created:
+            results.append(dict({"index": index, "status": "created"},
+                                **to_result(created[index])))
+        else:
+            results.append({"index": index, "status": "error",
+                            "errors": errors[index]})
+    return results
+
+
+def write_grouped(model, vals_by_id):
+    """Apply ``{record_id: vals}`` with one ``write()`` per distinct ``vals``."""
+    groups = defaultdict(list)
+    for record_id, vals in vals_by_id.items():
+        groups[json.dumps(vals, sort_keys=True, default=str)].append(
+            (record_id, vals))
+    for rows in groups.values():
+        model.browse([record_id for record_id, _ in rows]).write(rows[0][1])
+
+
+def create_in_chunks(model, rows, chunk_size):
+    """Create ``[(index, vals)]`` with one ``create()`` and savepoint per chunk.
+
+    A failing chunk is replayed row by row, so only the faulty rows fail.
+    Returns ``(created, failed)``: records and error messages by row index.
+    """
+    created, failed = {}, {}
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        try:
+            with model.env.cr.savepoint():
+                records = model.create([vals for _, vals in chunk])
+            created.update(zip([index for index, _ in chunk], records))
+        except Exception:
+            for index, vals in chunk:
+                try:
+                    with model.env.cr.savepoint():
+                        created[index] = model.create(vals)
+                except Exception as e:
+                    failed[index] = str(e)
+    return created, failed
+
+
+def upsert_by_key(model, key, items, to_vals):
+    """Create or update the valid ``{index: item}`` matched on ``key``.
+
+    Existing records are resolved with one query, new ones are created with
+    one ``create()``. Updates only write the fields whose value changes,
+    grouped by identical values; the matched ``key`` is never rewritten.
+    Returns the result of every row, rows with a missing or repeated key
+    are rejected.
+    """
+    results = {}
+    counts = Counter(item.get(key) for item in items.values())
+    for index, item in list(items.items()):
+        if not item.get(key):
+            results[index] = {"index": index, "status": "error",
+                              "errors": {key: ["Required to match records."]}}
+        elif counts[item[key]] > 1:
+            results[index] = {"index": index, "status": "error",
+                              "errors": {key: ["Duplicated in this batch."]}}
+    items = {index: item for index, item in items.items() if index not in results}
+
+    vals_by_index = {index: to_vals(item) for index, item in items.items()}
+    fnames = {fname for vals in vals_by_index.values() for fname in vals} - {key}
+    existing = {record[key]: record for record in model.search_read(
+        [(key, 'in', [item[key] for item in items.values()])],
+        [key] + sorted(fnames), load=None)}
+    to_create = [index for index, item in items.items() if item[key] not in existing]
+    records = model.create([vals_by_index[index] for index in to_create])
+
+    to_write = {}
+    for index, item in items.items():
+        record = existing.get(item[key])
+        if record:
+            changed = {fname: value for fname, value in vals_by_index[index].items()
+                       if fname != key and (record[fname] or False) != (value or False)}
+            if changed:
+                to_write[record['id']] = changed
+    write_grouped(model, to_write)
+
+    for index, record in zip(to_create, records):
+        results[index] = {"index": index, "status": "created", "id": record.id}
+    for index, item in items.items():
+        if item[key] in existing:
+            results[index] = {"index": index, "status": "updated",
+                              "id": existing[item[key]]['id']}
+    return results
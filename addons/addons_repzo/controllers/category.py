@@ -4,9 +4,15 @@ from marshmallow import ValidationError
 import json
 import logging
 from .marshmallow.ProductValidation import CategorySchema
+from .serializers import category_serializer
+from .bulk import load_many, upsert_by_key
+from .http_cache import list_etag, not_modified
 
 _logger = logging.getLogger(__name__)
 
+# (database, include_disabled) -> (category tree version, tree), kept by each worker
+_tree_cache = {}
+
 
 class CategoryEndpoint(http.Controller):
     def __init__(self):
@@ -16,19 +22,11 @@ class CategoryEndpoint(http.Controller):
     @http.route('/api/get_all_categories', type='json', auth='none', methods=['GET'])
     def get_all_categories(self):
         try:
+            if not_modified(list_etag(request.env['product.category'].sudo())):
+                return {}
+
             categories = request.env['product.category'].sudo().search([])
-            categories_data = [{
-                "id": category.id,
-                "_id": category._id,
-                "name": category.name or "",
-                "local_name": category.local_name or "",
-                "type": category.type or "",
-                # "photo": category.photo or "",
-                # "icon": category.icon or "",
-                "position": category.position or 0,  # Assuming a default position of 0
-                "createdAt": category.create_date.isoformat() if category.create_date else None,
-                "updatedAt": category.write_date.isoformat() if category.write_date else None,
-            } for category in categories]
+            categories_data = category_serializer.dump(categories)
 
             return {
                 "status": "success",
@@ -38,6 +36,27 @@ class CategoryEndpoint(http.Controller):
         except Exception as e:
             return {"status": "error", "message": str(e)}
 
+    @http.route('/api/get_categories_tree', type='json', auth='none', methods=['GET'])
+    def get_categories_tree(self):
+        try:
+            include_disabled = request.httprequest.args.get(
+                'include_disabled', 'false').lower() == 'true'
+            Category = request.env['product.category'].sudo()
+            version = Category._tree_version()
+            if not_modified('%s-%s' % (version, include_disabled)):
+                return {}
+
+            key = (request.env.cr.dbname, include_disabled)
+            cached = _tree_cache.get(key)
+            if not cached or cached[0] != version:
+                cached = _tree_cache[key] = (
+                    version, Category._repzo_tree(include_disabled))
+
+            return {"status": "success", "data": cached[1]}
+
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
     @http.route('/api/get_category_by_id/<int:category_id>', type='json', auth='none', methods=['GET'])
     def get_category_by_id(self, category_id):
         try:
@@ -46,18 +65,7 @@ class CategoryEndpoint(http.Controller):
             if not category.exists():
                 return {"status": "error", "message": "Category not found."}
 
-            category_data = {
-                "id": category.id,
-                "_id": category._id,
-                "name": category.name or "",
-                "type": category.type or "",
-                "local_name": category.local_name or "",
-                # "photo": category.photo or "",
-                # "icon": category.icon or "",
-                "position": category.position or 0,  # Assuming a default position of 0
-                "createdAt": category.create_date.isoformat() if category.create_date else None,
-                "updatedAt": category.write_date.isoformat() if category.write_date else None,
-            }
+            category_data = category_serializer.dump_one(category)
 
             return {"status": "success", "data": category_data}
 
@@ -107,6 +115,33 @@ class CategoryEndpoint(http.Controller):
         except Exception as e:
             return {"status": "error", "message": str(e)}
 
+    @http.route('/api/categories/bulk', type='json', auth='none', methods=['POST'])
+    def bulk_upsert_categories(self):
+        try:
+            data = json.loads(request.httprequest.data.decode('utf-8'))
+            items, errors = load_many(CategorySchema(many=True), data)
+
+            # Matched on Repzo's `_id`
+            results = upsert_by_key(
+                request.env['product.category'].sudo(), '_id',
+                {index: item for index, item in enumerate(items) if item is not None},
+                lambda item: {
+                    '_id': item['_id'],
+                    'name': item['name'],
+                    'local_name': item.get('local_name'),
+                    'type': item.get('type'),
+                    'position': item.get('position', 0),
+                })
+            results.update({index: {"index": index, "status": "error", "errors": messages}
+                            for index, messages in errors.items()})
+
+            return {"status": "success", "results": [results[index] for index in range(len(items))]}
+
+        except ValidationError as err:
+            return {"status": "error", "errors": err.messages}
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
     @http.route('/api/update_category/<int:category_id>', type='json', auth='none', methods=['PUT'])
     def update_category(self, category_id):
         try:
@@ -1,14 +1,25 @@
 import secrets
-from odoo import http
+from datetime import timedelta
+from odoo import http, fields
 from odoo.http import request
 from .marshmallow.ContactsValidation import ContactCreateValidationSchema
 from marshmallow import ValidationError
 from werkzeug.wrappers import Response
+from .pagination import (keyset_page, cursor_response, encode_cursor,
+                         encode_token, decode_token, InvalidCursor)
+from .serializers import partner_serializer
+from .bulk import load_many, write_grouped
+from collections import Counter
 
 import json
 import logging
 _logger = logging.getLogger(__name__)
 
+# Rows written by transactions still running when a sync page is read may
+# commit with an older write_date, they get this margin before the watermark
+# moves past them.
+SYNC_LAG = timedelta(seconds=60)
+
 
 class ContactCustomerEndpoint(http.Controller):
     def __init__(self):
@@ -45,68 +56,26 @@ class ContactCustomerEndpoint(http.Controller):
             per_page = int(request.httprequest.args.get('per_page', 10))
             current_page = int(request.httprequest.args.get('page', 1))
             offset = (current_page - 1) * per_page
+            # Cursor mode, `after` is empty for the first page
+            after = request.httprequest.args.get('after')
 
             # Fetching all partners
-            partners = request.env['res.partner'].sudo().search(
-                [], offset=offset, limit=per_page)
-            total_result = request.env['res.partner'].sudo().search_count([])
+            if after is not None:
+                partners, next_cursor = keyset_page(
+                    request.env['res.partner'].sudo(), [], after, per_page,
+                    key=request.httprequest.args.get('cursor_key', 'id'))
+            else:
+                partners = request.env['res.partner'].sudo().search(
+                    [], offset=offset, limit=per_page)
+
+            users_data = partner_serializer.dump(partners)
 
-            users_data = []
-            for partner in partners:
-                users_data.append({
-                    "_id": partner.id,
-                    # Assuming tags are stored in a many2many field
-                    # "tags": partner.tags_ids.mapped('id'),
-                    "disabled": partner.active is False,
-                    "formatted_address": partner.contact_address or "No location",
-                    "lat": partner.partner_latitude or 0,
-                    "lng": partner.partner_longitude or 0,
-                    # "location_verified": partner.location_verified,  # Custom field
-                    # Assuming there's a relation to reps
-                    # "assigned_to": partner.assigned_reps_ids.mapped('id'),
-                    # "profile_pic": partner.profile_pic or None,
-                    # "logo": partner.logo or None,
-                    "website": partner.website or "",
-                    "email": partner.email or "",
-                    "comment": partner.comment or "",
-                    "parent_client_id": partner.parent_id.id if partner.parent_id else None,
-                    # "target_visit": partner.target_visit or 0,
-                    # "geofencing_radius": partner.geofencing_radius or None,
-                    # "price_tag": partner.price_tag or None,
-                    # "status": partner.status or None,
-                    # Assuming job_category is many2many
-                    # "job_category": partner.job_category_ids.mapped('name'),
-                    # Assuming availability_msl is many2many
-                    # "availability_msl": partner.availability_msl_ids.mapped('id'),
-                    # "territory": partner.territory or None,
-                    # Assuming there's a relation to media
-                    # "assigned_media": partner.assigned_media_ids.mapped('id'),
-                    # Assuming there's a relation to products
-                    # "assigned_products": partner.assigned_product_ids.mapped('id'),
-                    # "company_namespace": partner.company_namespace or [],
-                    # Assuming teams are stored in a many2many field
-                    # "teams": partner.teams_ids.mapped('id'),
-                    "name": partner.name or "",
-                    # "client_code": partner.client_code or "",
-                    "phone": partner.phone or "",
-                    "city": partner.city or "",
-                    # "state": partner.state or "",
-                    "country": partner.country_id.name if partner.country_id else "",
-                    # "contact_name": partner.contact_name or "",
-                    # "contact_title": partner.contact_title or "",
-                    "zip": partner.zip or "",
-                    # "credit_limit": partner.credit_limit or 0,
-                    # "isChain": partner.is_chain or False,
-                    # Assuming there's a relation to channel
-                    # "channel": partner.channel_id.id if partner.channel_id else None,
-                    "sv_price_list_id": partner.sv_price_list_id.id if partner.sv_price_list_id else None,  # Custom field
-                    "payment_type": partner.payment_type or "",  # Custom field
-                    "id_repzo": partner.id_repzo or "",  # Custom field
-                    "__v": 0,  # This can be removed if not needed
-                    "createdAt": partner.create_date.isoformat() if partner.create_date else None,
-                    "updatedAt": partner.write_date.isoformat() if partner.write_date else None,
-                })
+            if after is not None:
+                return cursor_response(
+                    request.httprequest.host_url + "api/get_all_users",
+                    per_page, users_data, next_cursor)
 
+            total_result = request.env['res.partner'].sudo().search_count([])
             # Calculate total pages
             total_pages = (total_result + per_page -
                            1) // per_page  # Ceiling division
@@ -131,6 +100,58 @@ class ContactCustomerEndpoint(http.Controller):
         except Exception as e:
             return {"status": "error", "message": str(e)}
 
+    @http.route('/api/get_users_changes', type='json', auth='none', methods=['GET'])
+    def get_users_changes(self):
+        try:
+            per_page = int(request.httprequest.args.get('per_page', 100))
+            # Watermark returned as `next_since` by the previous call
+            since = request.httprequest.args.get('since')
+            after, tombstone_id = '', 0
+            if since:
+                try:
+                    after, tombstone_id = decode_token(since)
+                    tombstone_id = int(tombstone_id)
+                except (ValueError, TypeError) as e:
+                    raise InvalidCursor("Invalid watermark.") from e
+
+            settled = fields.Datetime.now() - SYNC_LAG
+
+            # Partners created or updated since the watermark
+            partners, next_cursor = keyset_page(
+                request.env['res.partner'].sudo(),
+                [('write_date', '<', settled)], after, per_page, key='updatedAt')
+
+            # Partners deleted or archived since the watermark
+            tombstones = request.env['repzo.tombstone'].sudo().search([
+                ('res_model', '=', 'res.partner'),
+                ('id', '>', tombstone_id),
+                ('create_date', '<', settled),
+            ], limit=per_page + 1)
+
+            has_more = next_cursor is not None or len(tombstones) > per_page
+            tombstones = tombstones[:per_page]
+            if partners and not next_cursor:
+                next_cursor = encode_cursor(
+                    'updatedAt', [partners[-1].write_date, partners[-1].id])
+            if tombstones:
+                tombstone_id = tombstones[-1].id
+
+            return {
+                "status": "success",
+                "changed": partner_serializer.dump(partners),
+                "removed": [{
+                    "_id": tombstone.res_id,
+                    "id_repzo": tombstone.id_repzo or "",
+                    "reason": tombstone.reason,
+                    "removedAt": tombstone.create_date.isoformat(),
+                } for tombstone in tombstones],
+                "has_more": has_more,
+                "next_since": encode_token([next_cursor or after, tombstone_id]),
+            }
+
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
     @http.route('/api/add_customer', type='json', auth='none', methods=['POST'])
     def add_customer(self):
         try:
@@ -176,6 +197,82 @@ class ContactCustomerEndpoint(http.Controller):
         except Exception as e:
             return {"status": "error", "message": str(e)}
 
+    @http.route('/api/customers/bulk', type='json', auth='none', methods=['POST'])
+    def bulk_upsert_customers(self):
+        try:
+            data = json.loads(request.httprequest.data.decode('utf-8'))
+            items, errors = load_many(
+                ContactCreateValidationSchema(many=True), data)
+            results = [{"index": index, "status": "error", "errors": errors[index]}
+                       if index in errors else None for index in range(len(items))]
+            valid = {index: item for index, item in enumerate(items)
+                     if item is not None}
+
+            def reject(index, field, message):
+                results[index] = {"index": index, "status": "error",
+                                  "errors": {field: [message]}}
+                valid.pop(index, None)
+
+            # Values that appear more than once in the batch are ambiguous
+            for field in ('id_repzo', 'email', 'phone'):
+                counts = Counter(item[field] for item in valid.values()
+                                 if item.get(field))
+                for index, item in list(valid.items()):
+                    if counts[item.get(field)] > 1:
+                        reject(index, field, "Duplicated in this batch.")
+
+            Partner = request.env['res.partner'].sudo().with_context(
+                active_test=False)
+
+            # One query for the partners already known by their Repzo id
+            existing = {partner['id_repzo']: partner['id'] for partner in Partner.search_read(
+                [('id_repzo', 'in', [item['id_repzo'] for item in valid.values()])],
+                ['id_repzo'])}
+
+            # One query for the emails and phones already used by other partners
+            emails = {item['email'] for item in valid.values() if item.get('email')}
+            phones = {item['phone'] for item in valid.values() if item.get('phone')}
+            owners = {'email': {}, 'phone': {}}
+            if emails or phones:
+                for partner in Partner.search_read(
+                        ['|', ('email', 'in', list(emails)), ('phone', 'in', list(phones))],
+                        ['email', 'phone']):
+                    owners['email'][partner['email']] = partner['id']
+                    owners['phone'][partner['phone']] = partner['id']
+            for index, item in list(valid.items()):
+                for field, message in (('email', "This email is already in use."),
+                                       ('phone', "This phone number is already in use.")):
+                    owner = owners[field].get(item.get(field))
+                    if owner and owner != existing.get(item['id_repzo']):
+                        reject(index, field, message)
+                        break
+
+            to_create, to_write = [], {}
+            for index, item in valid.items():
+                partner_id = existing.get(item['id_repzo'])
+                if partner_id:
+                    # matched on id_repzo, which is left as it is
+                    to_write[partner_id] = {field: value for field, value in item.items()
+                                            if field != 'id_repzo'}
+                    results[index] = {"index": index, "status": "updated",
+                                      "partner_id": partner_id}
+                else:
+                    to_create.append((index, item))
+
+            with request.env.cr.savepoint():
+                new_partners = Partner.create([item for _, item in to_create])
+                write_grouped(Partner, to_write)
+            for (index, _), partner in zip(to_create, new_partners):
+                results[index] = {"index": index, "status": "created",
+                                  "partner_id": partner.id}
+
+            return {"status": "success", "results": results}
+
+        except ValidationError as err:
+            return {"status": "error", "errors": err.messages}
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
     @http.route('/api/update_customer/<int:partner_id>', type='json', auth='none', methods=['PUT'])
     def update_customer(self, partner_id):
         try:
@@ -234,6 +331,76 @@ class ContactCustomerEndpoint(http.Controller):
         except Exception as e:
             return {"status": "error", "message": str(e)}
 
+    def _partners_by_repzo_ids(self, repzo_ids):
+        Partner = request.env['res.partner'].sudo()
+        resolved = Partner._resolve_repzo_ids(repzo_ids)
+        users_data = partner_serializer.dump(Partner.browse(list(resolved.values())))
+
+        # Cached ids may be stale if another worker changed the partner
+        found = {user["id_repzo"] for user in users_data if not user["disabled"]
+                 and resolved.get(user["id_repzo"]) == user["_id"]}
+        users_data = [user for user in users_data if user["id_repzo"] in found]
+        stale = set(resolved) - found
+        if stale:
+            Partner._forget_repzo_ids(stale)
+            resolved = Partner._resolve_repzo_ids(stale)
+            users_data += partner_serializer.dump(Partner.browse(list(resolved.values())))
+        return users_data
+
+    @http.route('/api/get_user_by_repzo_id/<string:id_repzo>', type='json', auth='none', methods=['GET'])
+    def get_user_by_repzo_id(self, id_repzo):
+        try:
+            users_data = self._partners_by_repzo_ids([id_repzo])
+            if not users_data:
+                return {"status": "error", "message": "Partner not found."}
+
+            return {"status": "success", "data": users_data[0]}
+
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
+    @http.route('/api/get_users_by_repzo_ids', type='json', auth='none', methods=['GET'])
+    def get_users_by_repzo_ids(self):
+        try:
+            # Comma separated Repzo ids
+            repzo_ids = [repzo_id for repzo_id in request.httprequest.args.get(
+                'ids', '').split(',') if repzo_id]
+            users_data = self._partners_by_repzo_ids(repzo_ids)
+            found = {user["id_repzo"] for user in users_data}
+
+            return {
+                "status": "success",
+                "data": users_data,
+                "not_found": [repzo_id for repzo_id in repzo_ids if repzo_id not in found],
+            }
+
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
+    @http.route('/api/get_users_nearby', type='json', auth='none', methods=['GET'])
+    def get_users_nearby(self):
+        try:
+            args = request.httprequest.args
+            if not args.get('lat') or not args.get('lng'):
+                return {"status": "error", "message": "lat and lng are required."}
+            lat, lng = float(args['lat']), float(args['lng'])
+            # Within `radius` km, or the `limit` nearest ones (default 20)
+            radius = float(args['radius']) if args.get('radius') else None
+            limit = int(args['limit']) if args.get('limit') else (
+                None if radius else 20)
+
+            Partner = request.env['res.partner'].sudo()
+            matches = Partner._search_nearby(lat, lng, radius, limit)
+            users_data = partner_serializer.dump(
+                Partner.browse([partner_id for partner_id, _ in matches]))
+            for user, (_, distance) in zip(users_data, matches):
+                user["distance_km"] = round(distance, 3)
+
+            return {"status": "success", "data": users_data}
+
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
     @http.route('/api/get_user/<int:partner_id>', type='json', auth='none', methods=['GET'])
     def get_user(self, partner_id):
         try:
@@ -244,27 +411,7 @@ class ContactCustomerEndpoint(http.Controller):
                 return {"status": "error", "message": "Partner not found."}
 
             # Constructing the user data
-            user_data = {
-                "_id": partner.id,
-                "disabled": partner.active is False,
-                "formatted_address": partner.contact_address or "No location",
-                "lat": partner.partner_latitude or 0,
-                "lng": partner.partner_longitude or 0,
-                "website": partner.website or "",
-                "email": partner.email or "",
-                "comment": partner.comment or "",
-                "parent_client_id": partner.parent_id.id if partner.parent_id else None,
-                "name": partner.name or "",
-                "phone": partner.phone or "",
-                "city": partner.city or "",
-                "country": partner.country_id.name if partner.country_id else "",
-                "zip": partner.zip or "",
-                "sv_price_list_id": partner.sv_price_list_id.id if partner.sv_price_list_id else None,
-                "payment_type": partner.payment_type or "",
-                "id_repzo": partner.id_repzo or "",
-                "createdAt": partner.create_date.isoformat() if partner.create_date else None,
-                "updatedAt": partner.write_date.isoformat() if partner.write_date else None,
-            }
+            user_data = partner_serializer.dump_one(partner)
 
             return {"status": "success", "data": user_data}
 
@@ -0,0 +1,38 @@
+import json
+import zlib
+
+import odoo
+from odoo import api, SUPERUSER_ID
+from .pagination import keyset_page
+
+EXPORT_BATCH_SIZE = 1000
+
+
+def iter_ndjson(dbname, model_name, domain, serializer, batch_size=EXPORT_BATCH_SIZE):
+    """Yield the records matching ``domain`` as NDJSON, one chunk per batch.
+
+    The body is consumed after the request transaction is closed, so the
+    generator reads with its own cursor (a single consistent snapshot). Rows
+    are fetched in keyset batches on ``id`` and the cache is dropped between
+    batches, so memory use does not depend on the size of the export.
+    """
+    with odoo.registry(dbname).cursor() as cr:
+        env = api.Environment(cr, SUPERUSER_ID, {})
+        after = ''
+        while True:
+            records, after = keyset_page(env[model_name], domain, after, batch_size)
+            if records:
+                yield ''.join(json.dumps(row) + '\n'
+                              for row in serializer.dump(records)).encode()
+            env.invalidate_all()
+            if not after:
+                break
+
+
+def gzip_stream(chunks, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,37 @@
+import hashlib
+
+from odoo.http import request
+from werkzeug.http import quote_etag
+
+
+def _tag(*parts):
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:20]
+
+
+def list_etag(model, domain=()):
+    """Validator of a list: number of records and latest ``write_date``."""
+    query = model._where_calc(list(domain))
+    model._apply_ir_rules(query, 'read')
+    query_str, params = query.select(
+        'count(*)', 'max("%s"."write_date")' % model._table)
+    model.env.cr.execute(query_str, params)
+    count, last_write = model.env.cr.fetchone()
+    return _tag(model._name, count, last_write)
+
+
+def record_etag(*records):
+    """Validator of a record, and of the records its response is made of."""
+    return _tag(*[(record._name, record.id, record.write_date) for record in records])
+
+
+def not_modified(etag):
+    """Send ``etag`` with the response and tell if the client copy is valid.
+
+    When it is, the route should return right away: json routes cannot set
+    their status, ``ir.http`` replaces the response by an empty 304.
+    """
+    request.future_response.headers['ETag'] = quote_etag(etag, weak=True)
+    if request.httprequest.if_none_match.contains_weak(etag):
+        request.repzo_not_modified = True
+        return True
+    return False
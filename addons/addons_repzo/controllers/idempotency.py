@@ -0,0 +1,51 @@
+import functools
+
+from odoo.http import request
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+
+class _ErrorResponse(Exception):
+    """Rolls back the savepoint of a route that returned an error."""
+
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+
+def _is_error(response):
+    return isinstance(response, dict) and response.get('status') == 'error'
+
+
+def idempotent(endpoint):
+    """Answer the retries of a route sending the ``Idempotency-Key`` header
+    with the response of the first call instead of processing them again."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = request.httprequest.headers.get(IDEMPOTENCY_HEADER)
+            if not key:
+                return func(*args, **kwargs)
+
+            keys = request.env['repzo.idempotency.key'].sudo()
+            try:
+                response = keys._acquire(key, request.env.uid, endpoint)
+            except ValueError as e:
+                return {"status": "error", "message": str(e)}
+            if response is not None:
+                return response
+
+            # Routes report their errors in the response and the transaction
+            # is committed anyway; undo what the failed call wrote so that
+            # the retry the released key allows cannot duplicate it.
+            try:
+                with request.env.cr.savepoint():
+                    response = func(*args, **kwargs)
+                    if _is_error(response):
+                        raise _ErrorResponse(response)
+            except _ErrorResponse as e:
+                response = e.response
+            keys._store(key, request.env.uid, response)
+            return response
+        return wrapper
+    return decorator
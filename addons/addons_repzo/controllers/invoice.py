@@ -3,6 +3,8 @@ from odoo.http import request
 from marshmallow import ValidationError
 import json
 import logging
+from .pagination import keyset_page, cursor_response
+from .serializers import invoice_serializer
 
 _logger = logging.getLogger(__name__)
 
@@ -19,23 +21,26 @@ class InvoiceEndpoint(http.Controller):
             per_page = int(request.httprequest.args.get('per_page', 10))
             current_page = int(request.httprequest.args.get('page', 1))
             offset = (current_page - 1) * per_page
+            # Cursor mode, `after` is empty for the first page
+            after = request.httprequest.args.get('after')
 
             # Fetching invoices
-            invoices = request.env['account.move'].sudo().search(
-                [], offset=offset, limit=per_page)
-            total_result = request.env['account.move'].sudo().search_count([])
+            if after is not None:
+                invoices, next_cursor = keyset_page(
+                    request.env['account.move'].sudo(), [], after, per_page,
+                    key=request.httprequest.args.get('cursor_key', 'id'))
+            else:
+                invoices = request.env['account.move'].sudo().search(
+                    [], offset=offset, limit=per_page)
+
+            invoices_data = invoice_serializer.dump(invoices)
+
+            if after is not None:
+                return cursor_response(
+                    request.httprequest.host_url + "api/get_all_invoices",
+                    per_page, invoices_data, next_cursor)
 
-            invoices_data = []
-            for invoice in invoices:
-                invoices_data.append({
-                    "_id": invoice.id,
-                    "invoice_number": invoice.name or "",
-                    "amount_total": invoice.amount_total or 0.0,
-                    "state": invoice.state or "",
-                    "partner_id": invoice.partner_id.id if invoice.partner_id else None,
-                    "createdAt": invoice.create_date.isoformat() if invoice.create_date else None,
-                    "updatedAt": invoice.write_date.isoformat() if invoice.write_date else None,
-                })
+            total_result = request.env['account.move'].sudo().search_count([])
 
             # Constructing the response
             response = {
@@ -59,15 +64,7 @@ class InvoiceEndpoint(http.Controller):
             if not invoice.exists():
                 return {"status": "error", "message": "Invoice not found."}
 
-            invoice_data = {
-                "_id": invoice.id,
-                "invoice_number": invoice.name or "",
-                "amount_total": invoice.amount_total or 0.0,
-                "state": invoice.state or "",
-                "partner_id": invoice.partner_id.id if invoice.partner_id else None,
-                "createdAt": invoice.create_date.isoformat() if invoice.create_date else None,
-                "updatedAt": invoice.write_date.isoformat() if invoice.write_date else None,
-            }
+            invoice_data = invoice_serializer.dump_one(invoice)
 
             return {"status": "success", "data": invoice_data}
 
@@ -1,4 +1,4 @@
-from marshmallow import Schema, fields, validate, ValidationError
+from marshmallow import Schema, fields, validate, validates_schema, ValidationError
 
 
 def validate_quantity(value):
@@ -41,3 +41,37 @@ class OrderCreateValidationSchema(Schema):
         error_messages={
             "invalid": "Invoice policy must be 'order' or 'delivery'."}
     )  # Supports invoicing policy for order validation
+
+
+class ReturnLineSchema(Schema):
+    order_id = fields.Int(required=True, error_messages={
+        "required": "Order ID is required."
+    })
+    product_id = fields.Int(required=True, error_messages={
+        "required": "Product ID is required."
+    })
+    quantity = fields.Float(required=True, validate=validate.Range(
+        min=0, min_inclusive=False), error_messages={
+        "required": "Quantity is required.",
+        "invalid": "Quantity must be a valid number."
+    })
+
+
+class ReturnCreateValidationSchema(Schema):
+    lines = fields.List(fields.Nested(ReturnLineSchema), required=True,
+                        validate=validate.Length(min=1), error_messages={
+                            "required": "Return lines are required."
+                        })
+
+
+class MassInvoiceValidationSchema(Schema):
+    order_ids = fields.List(fields.Int(), required=False)
+    # Odoo domain selecting the orders, used when no order_ids are sent; an
+    # empty one would invoice every order of the database
+    domain = fields.List(fields.Raw(), required=False, validate=validate.Length(
+        min=1, error="The domain cannot be empty."))
+
+    @validates_schema
+    def validate_selection(self, data, **kwargs):
+        if not data.get('order_ids') and not data.get('domain'):
+            raise ValidationError("Either order_ids or domain is required.")
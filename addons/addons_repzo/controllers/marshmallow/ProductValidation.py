@@ -50,3 +50,11 @@ class ProductCreateValidationSchema(Schema):
         sku = fields.Str(required=False, allow_none=True)
         # Default to 0 if not provided
         position = fields.Int(required=False, default=0)
+
+
+class PartnerPricesSchema(Schema):
+    partner_id = fields.Int(required=True)
+    product_ids = fields.List(fields.Int(), required=True,
+                              validate=validate.Length(min=1))
+    # Quantity the prices are computed for, 1 when not sent
+    quantity = fields.Float(required=False, validate=validate.Range(min=0))
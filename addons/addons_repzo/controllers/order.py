@@ -2,8 +2,15 @@ from odoo import http
 from odoo.http import request
 import json
 import logging
-from .marshmallow.OrderValidation import OrderCreateValidationSchema
+from .marshmallow.OrderValidation import (OrderCreateValidationSchema, ReturnCreateValidationSchema,
+                                         MassInvoiceValidationSchema)
+from .pagination import keyset_page, cursor_response
+from .serializers import order_serializer, order_line_serializer
+from .bulk import load_many, create_in_chunks, check_references, created_results
+from .idempotency import idempotent
 from marshmallow import ValidationError
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
 _logger = logging.getLogger(__name__)
 
 
@@ -15,23 +22,30 @@ class OrderEndpoint(http.Controller):
             per_page = int(request.httprequest.args.get('per_page', 10))
             current_page = int(request.httprequest.args.get('page', 1))
             offset = (current_page - 1) * per_page
+            # Cursor mode, `after` is empty for the first page
+            after = request.httprequest.args.get('after')
+            expand = request.httprequest.args.get('expand', '').split(',')
+            domain = self._order_domain(request.httprequest.args)
 
             # Fetching orders
-            orders = request.env['sale.order'].sudo().search(
-                [], offset=offset, limit=per_page)
-            total_result = request.env['sale.order'].sudo().search_count([])
-
-            orders_data = []
-            for order in orders:
-                orders_data.append({
-                    "_id": order.id,
-                    "order_name": order.name or "",
-                    "amount_total": order.amount_total or 0.0,
-                    "state": order.state or "",
-                    "partner_id": order.partner_id.id if order.partner_id else None,
-                    "createdAt": order.create_date.isoformat() if order.create_date else None,
-                    "updatedAt": order.write_date.isoformat() if order.write_date else None,
-                })
+            if after is not None:
+                orders, next_cursor = keyset_page(
+                    request.env['sale.order'].sudo(), domain, after, per_page,
+                    key=request.httprequest.args.get('cursor_key', 'id'))
+            else:
+                orders = request.env['sale.order'].sudo().search(
+                    domain, offset=offset, limit=per_page)
+
+            orders_data = order_serializer.dump(orders)
+            if 'lines' in expand:
+                self._embed_lines(orders, orders_data)
+
+            if after is not None:
+                return cursor_response(
+                    request.httprequest.host_url + "api/get_all_orders",
+                    per_page, orders_data, next_cursor)
+
+            total_result = request.env['sale.order'].sudo().search_count(domain)
 
             # Constructing the response
             response = {
@@ -48,6 +62,60 @@ class OrderEndpoint(http.Controller):
         except Exception as e:
             return {"status": "error", "message": str(e)}
 
+    def _order_domain(self, args):
+        # Filtering parameters
+        partner_id = args.get('partner_id', None)
+        state = args.get('state', None)
+        date_from = args.get('date_from', None)
+        date_to = args.get('date_to', None)
+
+        domain = []
+
+        # Filter by customer
+        if partner_id:
+            domain.append(('partner_id', '=', int(partner_id)))
+
+        # Filter by state, several states are comma separated
+        if state:
+            domain.append(('state', 'in', state.split(',')))
+
+        # Filter by order date range (ISO 8601, both bounds included), a
+        # date-only upper bound includes the whole day
+        if date_from:
+            domain.append(('date_order', '>=', self._parse_datetime(date_from)))
+        if date_to:
+            if self._is_date(date_to):
+                domain.append(('date_order', '<', self._parse_datetime(date_to) + timedelta(days=1)))
+            else:
+                domain.append(('date_order', '<=', self._parse_datetime(date_to)))
+
+        return domain
+
+    def _is_date(self, value):
+        try:
+            date.fromisoformat(value)
+        except ValueError:
+            return False
+        return True
+
+    def _parse_datetime(self, value):
+        # Naive UTC datetime like the ORM stores, dates are taken as UTC
+        # midnight
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        if value.tzinfo:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+    def _embed_lines(self, orders, orders_data):
+        # All the lines of the page are read at once and grouped by order
+        lines = request.env['sale.order.line'].sudo().search(
+            [('order_id', 'in', orders.ids)], order='order_id, sequence, id')
+        lines_by_order = defaultdict(list)
+        for line_data in order_line_serializer.dump(lines):
+            lines_by_order[line_data['order_id']].append(line_data)
+        for order_data in orders_data:
+            order_data['lines'] = lines_by_order[order_data['_id']]
+
     @http.route('/api/get_order_by_id/<int:order_id>', type='json', auth='none', methods=['GET'])
     def get_order_by_id(self, order_id):
         try:
@@ -55,15 +123,7 @@ class OrderEndpoint(http.Controller):
             if not order.exists():
                 return {"status": "error", "message": "Order not found."}
 
-            order_data = {
-                "_id": order.id,
-                "order_name": order.name or "",
-                "amount_total": order.amount_total or 0.0,
-                "state": order.state or "",
-                "partner_id": order.partner_id.id if order.partner_id else None,
-                "createdAt": order.create_date.isoformat() if order.create_date else None,
-                "updatedAt": order.write_date.isoformat() if order.write_date else None,
-            }
+            order_data = order_serializer.dump_one(order)
 
             return {"status": "success", "data": order_data}
 
@@ -71,6 +131,7 @@ class OrderEndpoint(http.Controller):
             return {"status": "error", "message": str(e)}
 
     @http.route('/api/add_order', type='json', auth='user', methods=['POST'])
+    @idempotent('add_order')
     def create_order(self, **kwargs):
         schema = OrderCreateValidationSchema()
         try:
@@ -92,6 +153,65 @@ class OrderEndpoint(http.Controller):
         except Exception as e:
             return {"status": "error", "message": str(e)}
 
+    @http.route('/api/orders/bulk', type='json', auth='user', methods=['POST'])
+    def bulk_add_orders(self):
+        try:
+            data = json.loads(request.httprequest.data.decode('utf-8'))
+            chunk_size = int(request.httprequest.args.get('chunk_size', 100))
+            items, errors = load_many(OrderCreateValidationSchema(many=True), data)
+            errors = dict(errors)
+            valid = {index: item for index, item in enumerate(items)
+                     if item is not None and index not in errors}
+
+            # One query per referenced model
+            check_references(request.env, valid, (
+                ('partner_id', 'res.partner', lambda item: [item['partner_id']]),
+                ('order_line', 'product.product',
+                 lambda item: [line['product_id'] for line in item['order_line']]),
+            ), errors)
+
+            Order = request.env['sale.order']
+            created, failed = create_in_chunks(Order, [
+                (index, {
+                    'partner_id': item['partner_id'],
+                    'order_line': [(0, 0, {
+                        'product_id': line['product_id'],
+                        'product_uom_qty': line['quantity'],
+                        'price_unit': line['price_unit'],
+                    }) for line in item['order_line']],
+                }) for index, item in valid.items()
+            ], chunk_size)
+            errors.update({index: {"_schema": [message]} for index, message in failed.items()})
+
+            # Confirm the whole batch at once, fall back to one savepoint per
+            # order so a failing order does not block the others
+            orders = Order.browse([order.id for order in created.values()])
+            try:
+                with request.env.cr.savepoint():
+                    orders.action_confirm()
+            except Exception:
+                for index, order in list(created.items()):
+                    try:
+                        with request.env.cr.savepoint():
+                            order.action_confirm()
+                    except Exception as e:
+                        errors[index] = {"_schema": [str(e)]}
+                        del created[index]
+                        with request.env.cr.savepoint():
+                            order.unlink()
+
+            results = created_results(len(items), created, errors, lambda order: {
+                "order_id": order.id,
+                "order_name": order.name,
+            })
+
+            return {"status": "success", "results": results}
+
+        except ValidationError as err:
+            return {"status": "error", "errors": err.messages}
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
     # @http.route('/api/add_order_invoice', type='json', auth='user', methods=['POST'])
     # def create_order_with_invoice_and_picking(self, **kwargs):
     #     schema = OrderCreateValidationSchema()
@@ -150,6 +270,7 @@ class OrderEndpoint(http.Controller):
     #     except Exception as e:
     #         return {"status": "error", "message": str(e)}
     @http.route('/api/add_order_invoice', type='json', auth='user', methods=['POST'])
+    @idempotent('add_order_invoice')
     def create_order_with_invoice_and_picking(self, **kwargs):
         schema = OrderCreateValidationSchema()
 
@@ -158,93 +279,78 @@ class OrderEndpoint(http.Controller):
             data = json.loads(request.httprequest.data.decode('utf-8'))
             validated_data = schema.load(data)
 
-            # Step 1: Create the order
-            order_data = {
-                'partner_id': validated_data['partner_id'],
-                'order_line': [(0, 0, {
-                    'product_id': line['product_id'],
-                    'product_uom_qty': line.get('quantity', 1),
-                    'price_unit': line['price_unit']
-                }) for line in validated_data['order_line']],
-            }
+            # Heavy chain, run it in the background when asked to
+            if request.httprequest.args.get('async', 'false').lower() == 'true':
+                job = request.env['repzo.order.job'].sudo()._enqueue(
+                    schema.dump(validated_data), request.env.uid)
+                return {"status": "queued", "job_id": job.id}
 
-            order = request.env['sale.order'].create(order_data)
+            return request.env['sale.order']._repzo_create_with_invoice(
+                validated_data)
 
-            # Step 2: Confirm the order
-            order.action_confirm()
+        except ValidationError as err:
+            return {"status": "error", "errors": err.messages}
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
+    @http.route('/api/add_returns', type='json', auth='user', methods=['POST'])
+    @idempotent('add_returns')
+    def create_returns(self, **kwargs):
+        schema = ReturnCreateValidationSchema()
+        try:
+            data = json.loads(request.httprequest.data.decode('utf-8'))
+            validated_data = schema.load(data)
+
+            return_pickings = request.env['sale.order']._repzo_create_returns(
+                validated_data['lines'])
+
+            return {"status": "success", "return_picking_ids": return_pickings}
+
+        except ValidationError as err:
+            return {"status": "error", "errors": err.messages}
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
+    @http.route('/api/invoice_orders', type='json', auth='user', methods=['POST'])
+    @idempotent('invoice_orders')
+    def invoice_orders(self, **kwargs):
+        schema = MassInvoiceValidationSchema()
+        try:
+            data = json.loads(request.httprequest.data.decode('utf-8'))
+            validated_data = schema.load(data)
 
-            # Step 3: Validate stock picking (Inventory Movement)
-            return_pickings = []  # Store return picking records
-
-            for picking in order.picking_ids:
-                if picking.state == 'draft':
-                    picking.action_confirm()  # Confirm if it's in draft
-
-                if picking.state in ['confirmed', 'waiting', 'assigned']:
-                    picking.action_assign()  # Assign stock
-
-                if picking.state == 'assigned':  # Stock is assigned, now validate
-                    return_moves = []
-                    for move in picking.move_ids_without_package:
-                        move_qty = move.product_uom_qty  # Get quantity from stock.move
-                        for move_line in move.move_line_ids:
-                            qty_done = move_qty  # Default full quantity
-
-                            # Handle returns if qty_done is negative
-                            if 'qty_done' in validated_data and validated_data['qty_done'] < 0:
-                                return_moves.append({
-                                    'move_id': move.id,
-                                    # Convert to positive for return
-                                    'quantity': abs(validated_data['qty_done'])
-                                })
-                            else:
-                                # Normal process
-                                move_line.write({'qty_done': qty_done})
-
-                    picking.button_validate()  # Validate delivery
-
-                    # Process return if any negative quantities exist
-                    if return_moves:
-                        # ✅ Ensure picking is a SINGLE record
-                        return_wizard = request.env['stock.return.picking'].with_context(
-                            active_id=picking.id, active_ids=[
-                                picking.id]  # Fix: Use list for active_ids
-                        ).create({})
-
-                        for return_move in return_wizard.product_return_moves:
-                            for move in return_moves:
-                                if return_move.move_id.id == move['move_id']:
-                                    return_move.quantity = move['quantity']
-
-                        return_picking = return_wizard.create_returns()  # Create return picking
-                        return_pickings.append(return_picking.get(
-                            'res_id'))  # Store return picking ID
-
-            # Step 4: Ensure Picking Validation Before Invoicing
-            invoice = None
-            all_pickings_validated = all(
-                picking.state == 'done' for picking in order.picking_ids)
-
-            if order.invoice_status != 'no':
-                if all_pickings_validated:
-                    invoice = order._create_invoices()
-                    invoice.action_post()
-                else:
-                    return {
-                        "status": "error",
-                        "message": "Cannot create an invoice because the delivery is not yet validated."
-                    }
+            # Invoiced in chunks by the job queue, follow it with get_order_job
+            job = request.env['repzo.order.job'].sudo()._enqueue(
+                validated_data, request.env.uid, job_type='mass_invoice')
+            return {"status": "queued", "job_id": job.id}
+
+        except ValidationError as err:
+            return {"status": "error", "errors": err.messages}
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
+    @http.route('/api/get_order_job/<int:job_id>', type='json', auth='user', methods=['GET'])
+    def get_order_job(self, job_id):
+        try:
+            job = request.env['repzo.order.job'].sudo().browse(job_id)
+            if not job.exists() or job.user_id.id != request.env.uid:
+                return {"status": "error", "message": "Job not found."}
 
             return {
                 "status": "success",
-                "order_id": order.id,
-                "invoice_id": invoice.id if invoice else None,
-                "picking_ids": [picking.id for picking in order.picking_ids],
-                "return_picking_ids": return_pickings,
+                "data": {
+                    "job_id": job.id,
+                    "type": job.job_type,
+                    "state": job.state,
+                    "progress": {"done": job.progress_done, "total": job.progress_total},
+                    "result": json.loads(job.result) if job.result else None,
+                    "error": job.error or "",
+                    "createdAt": job.create_date.isoformat() if job.create_date else None,
+                    "startedAt": job.date_started.isoformat() if job.date_started else None,
+                    "doneAt": job.date_done.isoformat() if job.date_done else None,
+                },
             }
 
-        except ValidationError as err:
-            return {"status": "error", "errors": err.messages}
         except Exception as e:
             return {"status": "error", "message": str(e)}
 
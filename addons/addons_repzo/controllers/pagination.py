@@ -0,0 +1,102 @@
+from datetime import datetime
+from urllib.parse import urlencode
+import base64
+import json
+
+from odoo.http import request
+from odoo.osv import expression
+
+# Supported cursor keys and the fields they order by, ``id`` is always
+# appended as the final tie-breaker so the order is stable. Every model
+# paginated by cursor has a (write_date, id) index for ``updatedAt``.
+CURSOR_KEYS = {
+    'id': [],
+    'updatedAt': ['write_date'],
+}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_token(payload):
+    """Opaque url-safe representation of a JSON-serializable ``payload``."""
+    data = json.dumps(payload).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def decode_token(token):
+    return json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+
+
+def encode_cursor(key, values):
+    return encode_token([key] + [
+        value.isoformat() if isinstance(value, datetime) else value
+        for value in values
+    ])
+
+
+def decode_cursor(token):
+    try:
+        key, *values = decode_token(token)
+        names = CURSOR_KEYS[key] + ['id']
+        if len(values) != len(names):
+            raise ValueError(token)
+        values = [
+            int(value) if name == 'id' else datetime.fromisoformat(value)
+            for name, value in zip(names, values)
+        ]
+    except (ValueError, TypeError, KeyError) as e:
+        raise InvalidCursor("Invalid cursor.") from e
+    return key, values
+
+
+def _after_domain(names, values):
+    # (a, b, id) > (va, vb, vid) expanded into a domain the ORM understands
+    if len(names) == 1:
+        return [(names[0], '>', values[0])]
+    return ['|', (names[0], '>', values[0]), '&', (names[0], '=', values[0])] + \
+        _after_domain(names[1:], values[1:])
+
+
+def keyset_page(model, domain, after, limit, key='id'):
+    """Return ``(records, next_cursor)`` for the page following ``after``.
+
+    An empty ``after`` starts from the beginning ordered by ``key``; a
+    non-empty one carries its own key, so ``key`` is then ignored.
+    """
+    if after:
+        key, values = decode_cursor(after)
+    elif key not in CURSOR_KEYS:
+        raise InvalidCursor("Invalid cursor key, expected one of: %s." %
+                            ", ".join(CURSOR_KEYS))
+    names = CURSOR_KEYS[key] + ['id']
+    if after:
+        after_domain = _after_domain(names, values)
+        if len(names) > 1:
+            # the expanded comparison is only a filter, the leading >= gives
+            # the ordered index scan its start
+            after_domain = expression.AND([[(names[0], '>=', values[0])], after_domain])
+        domain = expression.AND([domain, after_domain])
+
+    records = model.search(domain, order=', '.join(names), limit=limit + 1)
+    next_cursor = None
+    if len(records) > limit:
+        records = records[:limit]
+        next_cursor = encode_cursor(key, [records[-1][name] for name in names])
+    return records, next_cursor
+
+
+def cursor_response(path, per_page, data, next_cursor):
+    next_page_url = None
+    if next_cursor:
+        args = dict(request.httprequest.args, after=next_cursor)
+        next_page_url = "{}?{}".format(path, urlencode(args))
+    return {
+        "current_count": len(data),
+        "per_page": per_page,
+        "next_cursor": next_cursor,
+        "next_page_url": next_page_url,
+        "path": path,
+        "data": data,
+    }
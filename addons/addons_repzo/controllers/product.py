@@ -1,14 +1,27 @@
 from odoo import http
 from odoo.http import request
-from .marshmallow.ProductValidation import ProductCreateValidationSchema
+from .marshmallow.ProductValidation import ProductCreateValidationSchema, PartnerPricesSchema
 from marshmallow import ValidationError
 from werkzeug.wrappers import Response
+from .pagination import keyset_page, cursor_response
+from .serializers import product_serializer
+from .export import iter_ndjson, gzip_stream
+from .bulk import load_many, create_in_chunks, check_references, created_results
+from .http_cache import record_etag, not_modified
 
 import json
 import logging
 
 _logger = logging.getLogger(__name__)
 
+# Public sort keys of the product list, prefix with `-` for descending order
+PRODUCT_SORT_KEYS = {
+    'createdAt': 'create_date',
+    'updatedAt': 'write_date',
+    'name': 'name',
+    'price': 'list_price',
+}
+
 
 class ProductEndpoint(http.Controller):
     def __init__(self):
@@ -57,6 +70,44 @@ class ProductEndpoint(http.Controller):
     #     except Exception as e:
     #         return {"status": "error", "message": str(e)}
 
+    def _product_domain(self, args):
+        # Filtering parameters
+        active = args.get('active', None)
+        category_id = args.get('category', None)
+        sub_category_id = args.get('sub_category', None)
+        search_query = args.get('search', None)
+
+        domain = []
+
+        # Filter by active status
+        if active is not None:
+            domain.append(('active', '=', active.lower() == 'true'))
+
+        # Filter by category
+        if category_id:
+            domain.append(('categ_id', '=', category_id))
+
+        # Filter by sub-category
+        if sub_category_id:
+            # Assuming there's a sub-category field
+            domain.append(('sub_categ_id', '=', sub_category_id))
+
+        # Search by name, local name, reference or barcode
+        if search_query:
+            domain += request.env['product.product']._search_text_domain(
+                search_query)
+
+        return domain
+
+    def _product_order(self, sort_by):
+        direction = 'desc' if sort_by.startswith('-') else 'asc'
+        field = PRODUCT_SORT_KEYS.get(sort_by.lstrip('-'))
+        if not field:
+            raise ValueError("Invalid sort, expected one of: %s." %
+                             ", ".join(PRODUCT_SORT_KEYS))
+        # id keeps the order stable between pages
+        return '{0} {1}, id {1}'.format(field, direction)
+
     @http.route('/api/get_all_products', type='json', auth='none', methods=['GET'])
     def get_all_products(self):
         try:
@@ -65,64 +116,52 @@ class ProductEndpoint(http.Controller):
             current_page = int(request.httprequest.args.get('page', 1))
             offset = (current_page - 1) * per_page
 
-            # Filtering parameters
-            active = request.httprequest.args.get('active', None)
-            category_id = request.httprequest.args.get('category', None)
-            sub_category_id = request.httprequest.args.get(
-                'sub_category', None)
-            search_query = request.httprequest.args.get('search', None)
             with_default_variant = request.httprequest.args.get(
                 'withDefaultVariant', 'false').lower() == 'true'
-            sort_by = request.httprequest.args.get('sort', 'createdAt')
+            # Search results are ranked by relevance unless a sort is sent
+            sort_by = request.httprequest.args.get('sort')
+            order = self._product_order(sort_by or 'createdAt')
 
             # Build domain for search
-            domain = []
-
-            # Filter by active status
-            if active is not None:
-                domain.append(('active', '=', active.lower() == 'true'))
-
-            # Filter by category
-            if category_id:
-                domain.append(('categ_id', '=', category_id))
-
-            # Filter by sub-category
-            if sub_category_id:
-                # Assuming there's a sub-category field
-                domain.append(('sub_categ_id', '=', sub_category_id))
-
-            # Search by name
-            if search_query:
-                domain.append(('name', 'ilike', search_query))
-
-            # Fetching products based on the domain
-            products = request.env['product.product'].sudo().search(
-                domain, offset=offset, limit=per_page)
+            domain = self._product_domain(request.httprequest.args)
+
+            # Fetching products based on the domain, cursor mode when `after` is sent
+            Product = request.env['product.product'].sudo()
+            after = request.httprequest.args.get('after')
+            if after is not None:
+                products, next_cursor = keyset_page(
+                    Product, domain, after,
+                    per_page, key=request.httprequest.args.get('cursor_key', 'id'))
+            elif request.httprequest.args.get('search') and not sort_by:
+                # Most relevant matches first
+                products = Product.browse(Product._search_ranked(
+                    request.httprequest.args['search'], domain, offset, per_page))
+            elif sort_by and Product._fields[PRODUCT_SORT_KEYS[sort_by.lstrip('-')]].inherited:
+                # Sorted on a template field, see _template_sorted_query
+                products = Product.browse(Product._template_sorted_query(
+                    domain, order, offset, per_page,
+                    categ_id=request.httprequest.args.get('category')))
+            else:
+                products = Product.search(
+                    domain, offset=offset, limit=per_page, order=order)
+
+            products_data = product_serializer.dump(products)
+
+            # Include default variant if specified
+            if with_default_variant:
+                default_variants = products.product_tmpl_id._default_variant_ids()
+                for product, product_data in zip(products, products_data):
+                    product_data['default_variant'] = default_variants.get(
+                        product.product_tmpl_id.id)
+
+            if after is not None:
+                return cursor_response(
+                    request.httprequest.host_url + "api/get_all_products",
+                    per_page, products_data, next_cursor)
 
             total_result = request.env['product.product'].sudo(
             ).search_count(domain)
 
-            products_data = []
-            for product in products:
-                product_data = {
-                    "_id": product.id,
-                    "name": product.name or "",
-                    "price": product.list_price or 0.0,
-                    "description": product.description_sale or "",
-                    "category_id": product.categ_id.id if product.categ_id else None,
-                    "active": product.active,
-                    "createdAt": product.create_date.isoformat() if product.create_date else None,
-                    "updatedAt": product.write_date.isoformat() if product.write_date else None,
-                }
-
-                # Include default variant if specified
-                if with_default_variant:
-                    default_variant = product.product_tmpl_id.product_variant_ids.filtered(
-                        lambda v: v.id == product.id)
-                    product_data['default_variant'] = default_variant.id if default_variant else None
-
-                products_data.append(product_data)
-
             # Constructing the response
             response = {
                 "total_result": total_result,
@@ -138,6 +177,19 @@ class ProductEndpoint(http.Controller):
         except Exception as e:
             return {"status": "error", "message": str(e)}
 
+    @http.route('/api/export_products', type='http', auth='none', methods=['GET'])
+    def export_products(self):
+        # Full product set as NDJSON, gzip-compressed when the client accepts it
+        domain = self._product_domain(request.httprequest.args)
+        gzipped = 'gzip' in request.httprequest.headers.get('Accept-Encoding', '')
+        headers = [('Content-Type', 'application/x-ndjson')]
+        body = iter_ndjson(request.env.cr.dbname, 'product.product',
+                           domain, product_serializer)
+        if gzipped:
+            headers.append(('Content-Encoding', 'gzip'))
+            body = gzip_stream(body)
+        return Response(body, headers=headers, direct_passthrough=True)
+
     @http.route('/api/get_product_by_id/<int:product_id>', type='json', auth='none', methods=['GET'])
     def get_product_by_id(self, product_id):
         try:
@@ -145,22 +197,70 @@ class ProductEndpoint(http.Controller):
             if not product.exists():
                 return {"status": "error", "message": "Product not found."}
 
-            product_data = {
-                "_id": product.id,
-                "name": product.name or "",
-                "price": product.list_price or 0.0,
-                "description": product.description_sale or "",
-                "category_id": product.categ_id.id if product.categ_id else None,
-                "active": product.active,
-                "createdAt": product.create_date.isoformat() if product.create_date else None,
-                "updatedAt": product.write_date.isoformat() if product.write_date else None,
-            }
+            # The price and names are stored on the template
+            if not_modified(record_etag(product, product.product_tmpl_id)):
+                return {}
+
+            product_data = product_serializer.dump_one(product)
 
             return {"status": "success", "data": product_data}
 
         except Exception as e:
             return {"status": "error", "message": str(e)}
 
+    def _product_template_vals(self, validated_data):
+        return {
+            'name': validated_data['name'],
+            'local_name': validated_data.get('local_name', ''),
+            'categ_id': validated_data['category'],
+            'brand_id': validated_data['brand'],
+            'barcode': validated_data.get('barcode', ''),
+            'default_code': validated_data.get('sku', ''),
+            # Convert image URL to binary
+            # 'image_1920': self._get_image_binary(validated_data.get('product_img')),
+            # measure_unit_ID
+            # 'uom_id': validated_data.get('sv_measureUnit'),
+            # 'uom_po_id': request.env.ref('uom.product_uom_unit').id,  # Set default UoM
+            # tax_id
+            'taxes_id': [(6, 0, [int(tax_id) for tax_id in validated_data.get('sv_tax') or []])],
+            'frozen_pre_sales': validated_data.get('frozen_pre_sales', False),
+            'frozen_sales': validated_data.get('frozen_sales', False),
+        }
+
+    @http.route('/api/get_partner_prices', type='json', auth='none', methods=['POST'])
+    def get_partner_prices(self):
+        try:
+            data = json.loads(request.httprequest.data.decode('utf-8'))
+            validated_data = PartnerPricesSchema().load(data)
+
+            partner = request.env['res.partner'].sudo().browse(
+                validated_data['partner_id'])
+            if not partner.exists():
+                return {"status": "error", "message": "Partner not found."}
+
+            pricelist = partner.sv_price_list_id or partner.property_product_pricelist
+            if not pricelist:
+                return {"status": "error", "message": "The partner has no pricelist."}
+
+            product_ids = validated_data['product_ids']
+            prices = pricelist._repzo_prices(
+                product_ids, validated_data.get('quantity', 1.0))
+
+            return {
+                "status": "success",
+                "pricelist_id": pricelist.id,
+                "currency": pricelist.currency_id.name,
+                "data": [{"product_id": product_id, "price": prices[product_id]}
+                         for product_id in product_ids if product_id in prices],
+                "not_found": [product_id for product_id in product_ids
+                              if product_id not in prices],
+            }
+
+        except ValidationError as err:
+            return {"status": "error", "errors": err.messages}
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
     @http.route('/api/add_product', type='json', auth='none', methods=['POST'])
     def add_product(self):
         try:
@@ -179,23 +279,7 @@ class ProductEndpoint(http.Controller):
             _logger.debug("@1@: %s", validated_data)
 
             # Prepare product values
-            product_vals = {
-                'name': validated_data['name'],
-                'local_name': validated_data.get('local_name', ''),
-                'categ_id': validated_data['category'],
-                'brand_id': validated_data['brand'],
-                'barcode': validated_data.get('barcode', ''),
-                'default_code': validated_data.get('sku', ''),
-                # Convert image URL to binary
-                # 'image_1920': self._get_image_binary(validated_data.get('product_img')),
-                # measure_unit_ID
-                # 'uom_id': validated_data.get('sv_measureUnit'),
-                # 'uom_po_id': request.env.ref('uom.product_uom_unit').id,  # Set default UoM
-                # tax_id
-                'taxes_id': [(6, 0, validated_data.get('sv_tax', []))],
-                'frozen_pre_sales': validated_data.get('frozen_pre_sales', False),
-                'frozen_sales': validated_data.get('frozen_sales', False),
-            }
+            product_vals = self._product_template_vals(validated_data)
             _logger.debug("@2@: %s", product_vals)
 
             # Create the new product
@@ -203,6 +287,10 @@ class ProductEndpoint(http.Controller):
                 product_vals)
             _logger.debug("@3@: %s", new_product.id)
 
+            # The image is downloaded in the background
+            request.env['repzo.product.image'].sudo()._enqueue(
+                {new_product.id: validated_data.get('product_img')})
+
             # Handle variants
             # if 'variants' in validated_data:
             #     for variant in validated_data['variants']:
@@ -225,6 +313,76 @@ class ProductEndpoint(http.Controller):
             _logger.error("Error while adding product: %s", str(e))
             return {"status": "error", "message": str(e)}
 
+    @http.route('/api/products/bulk', type='json', auth='none', methods=['POST'])
+    def bulk_add_products(self):
+        try:
+            data = json.loads(request.httprequest.data.decode('utf-8'))
+            chunk_size = int(request.httprequest.args.get('chunk_size', 500))
+            items, errors = load_many(
+                ProductCreateValidationSchema(many=True), data)
+            errors = dict(errors)
+
+            # Tax ids are sent as strings
+            for index, item in enumerate(items):
+                if item is not None and index not in errors:
+                    try:
+                        item['sv_tax'] = [int(tax_id) for tax_id in item.get('sv_tax') or []]
+                    except ValueError:
+                        errors[index] = {"sv_tax": ["Tax ids must be integers."]}
+
+            valid = {index: item for index, item in enumerate(items)
+                     if item is not None and index not in errors}
+
+            # One query per referenced model, archived records included
+            check_references(request.env['product.template'].sudo().with_context(
+                active_test=False).env, valid, (
+                ('category', 'product.category', lambda item: [item['category']]),
+                ('brand', 'product.brand', lambda item: [item['brand']]),
+                ('sv_tax', 'account.tax', lambda item: item['sv_tax']),
+            ), errors)
+
+            created, failed = create_in_chunks(
+                request.env['product.template'].sudo(),
+                [(index, self._product_template_vals(item)) for index, item in valid.items()],
+                chunk_size)
+            errors.update({index: {"_schema": [message]} for index, message in failed.items()})
+            request.env['repzo.product.image'].sudo()._enqueue({
+                created[index].id: valid[index].get('product_img') for index in created})
+
+            results = created_results(len(items), created, errors,
+                                      lambda template: {"product_id": template.id})
+
+            return {"status": "success", "results": results}
+
+        except ValidationError as err:
+            return {"status": "error", "errors": err.messages}
+        except Exception as e:
+            _logger.error("Error while importing products: %s", str(e))
+            return {"status": "error", "message": str(e)}
+
+    @http.route('/api/get_product_image_status/<int:product_id>', type='json', auth='none', methods=['GET'])
+    def get_product_image_status(self, product_id):
+        try:
+            job = request.env['repzo.product.image'].sudo().search(
+                [('product_tmpl_id', '=', product_id)], order='id desc', limit=1)
+            if not job:
+                return {"status": "error", "message": "No image queued for this product."}
+
+            return {
+                "status": "success",
+                "data": {
+                    "product_id": product_id,
+                    "url": job.url,
+                    "state": job.state,
+                    "attempts": job.attempts,
+                    "error": job.error or "",
+                    "updatedAt": job.write_date.isoformat() if job.write_date else None,
+                },
+            }
+
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
     # def _get_image_binary(self, image_url):
     #     # Implement logic to convert image URL to binary data
     #     # For example, you can use requests to fetch the image and convert it
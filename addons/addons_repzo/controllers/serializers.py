@@ -0,0 +1,203 @@
+from collections import defaultdict
+
+
+class Field:
+    """Output value read from the field ``name`` of each record.
+
+    Without ``default`` the value is returned as read, otherwise falsy
+    values are replaced by ``default``. ``convert`` post-processes the value.
+    """
+
+    def __init__(self, name, default=None, convert=None):
+        self.name = name
+        self.default = default
+        self.convert = convert
+
+    def value(self, row, names):
+        value = row[self.name]
+        if self.convert:
+            value = self.convert(value)
+        if self.default is not None:
+            value = value or self.default
+        return value
+
+
+class Const:
+    """Constant output value, no field is read for it."""
+
+    name = None
+
+    def __init__(self, value):
+        self._value = value
+
+    def value(self, row, names):
+        return self._value
+
+
+class Id(Field):
+    """Many2one id, ``None`` when empty."""
+
+    def value(self, row, names):
+        return row[self.name] or None
+
+
+class Date(Field):
+    """Datetime field as an ISO 8601 string, ``None`` when empty."""
+
+    def value(self, row, names):
+        return row[self.name].isoformat() if row[self.name] else None
+
+
+class Name(Field):
+    """``attr`` of the many2one target, resolved for the whole page at once."""
+
+    def __init__(self, name, default=None, attr='name'):
+        super().__init__(name, default)
+        self.attr = attr
+
+    def value(self, row, names):
+        value = names[self.name].get(row[self.name])
+        return value or self.default
+
+
+class Names(Name):
+    """``attr`` of every record of a x2many field."""
+
+    def value(self, row, names):
+        return [names[self.name][id_] for id_ in row[self.name]]
+
+
+class RecordSerializer:
+    """Builds the API representation of whole recordsets.
+
+    The page is fetched with a single ``read()`` and every :class:`Name` /
+    :class:`Names` field costs one extra ``read()`` per target model, so the
+    number of queries does not depend on the number of records.
+    """
+
+    def __init__(self, fields):
+        self.fields = fields
+
+    def dump(self, records):
+        fnames = {f.name for f in self.fields.values() if f.name}
+        rows = records.read(list(fnames), load=None)
+        names = self._resolve_names(records, rows)
+        return [
+            {key: f.value(row, names) for key, f in self.fields.items()}
+            for row in rows
+        ]
+
+    def dump_one(self, record):
+        return self.dump(record)[0]
+
+    def _resolve_names(self, records, rows):
+        # group the related ids by (target model, attribute) to read them once
+        wanted = defaultdict(set)
+        for f in self.fields.values():
+            if isinstance(f, Name):
+                comodel = records._fields[f.name].comodel_name
+                for row in rows:
+                    value = row[f.name]
+                    wanted[comodel, f.attr].update(
+                        value if isinstance(value, list) else [value] if value else [])
+
+        resolved = {}
+        for (comodel, attr), ids in wanted.items():
+            targets = records.env[comodel].browse(ids)
+            resolved[comodel, attr] = {
+                row['id']: row[attr] for row in targets.read([attr], load=None)}
+
+        return {
+            f.name: resolved.get((records._fields[f.name].comodel_name, f.attr), {})
+            for f in self.fields.values() if isinstance(f, Name)
+        }
+
+
+partner_serializer = RecordSerializer({
+    "_id": Field('id'),
+    "disabled": Field('active', convert=lambda active: active is False),
+    "formatted_address": Field('contact_address', default="No location"),
+    "lat": Field('partner_latitude', default=0),
+    "lng": Field('partner_longitude', default=0),
+    "website": Field('website', default=""),
+    "email": Field('email', default=""),
+    "comment": Field('comment', default=""),
+    "parent_client_id": Id('parent_id'),
+    "name": Field('name', default=""),
+    "phone": Field('phone', default=""),
+    "city": Field('city', default=""),
+    "country": Name('country_id', default=""),
+    "zip": Field('zip', default=""),
+    "sv_price_list_id": Id('sv_price_list_id'),
+    "payment_type": Field('payment_type', default=""),
+    "id_repzo": Field('id_repzo', default=""),
+    "__v": Const(0),
+    "createdAt": Date('create_date'),
+    "updatedAt": Date('write_date'),
+})
+
+product_serializer = RecordSerializer({
+    "_id": Field('id'),
+    "name": Field('name', default=""),
+    "price": Field('list_price', default=0.0),
+    "description": Field('description_sale', default=""),
+    "category_id": Id('categ_id'),
+    "active": Field('active'),
+    "createdAt": Date('create_date'),
+    "updatedAt": Date('write_date'),
+})
+
+order_serializer = RecordSerializer({
+    "_id": Field('id'),
+    "order_name": Field('name', default=""),
+    "amount_total": Field('amount_total', default=0.0),
+    "state": Field('state', default=""),
+    "partner_id": Id('partner_id'),
+    "createdAt": Date('create_date'),
+    "updatedAt": Date('write_date'),
+})
+
+order_line_serializer = RecordSerializer({
+    "_id": Field('id'),
+    "order_id": Id('order_id'),
+    "product_id": Id('product_id'),
+    "product_name": Name('product_id', default=""),
+    "description": Field('name', default=""),
+    "quantity": Field('product_uom_qty', default=0.0),
+    "qty_delivered": Field('qty_delivered', default=0.0),
+    "qty_invoiced": Field('qty_invoiced', default=0.0),
+    "price_unit": Field('price_unit', default=0.0),
+    "discount": Field('discount', default=0.0),
+    "price_subtotal": Field('price_subtotal', default=0.0),
+    "price_total": Field('price_total', default=0.0),
+})
+
+invoice_serializer = RecordSerializer({
+    "_id": Field('id'),
+    "invoice_number": Field('name', default=""),
+    "amount_total": Field('amount_total', default=0.0),
+    "state": Field('state', default=""),
+    "partner_id": Id('partner_id'),
+    "createdAt": Date('create_date'),
+    "updatedAt": Date('write_date'),
+})
+
+brand_serializer = RecordSerializer({
+    "id": Field('id'),
+    "_id": Field('_id'),
+    "name": Field('name', default=""),
+    "company_namespace": Names('company_namespace'),
+    "createdAt": Date('create_date'),
+    "updatedAt": Date('write_date'),
+})
+
+category_serializer = RecordSerializer({
+    "id": Field('id'),
+    "_id": Field('_id'),
+    "name": Field('name', default=""),
+    "local_name": Field('local_name', default=""),
+    "type": Field('type', default=""),
+    "position": Field('position', default=0),
+    "createdAt": Date('create_date'),
+    "updatedAt": Date('write_date'),
+})
@@ -0,0 +1,31 @@
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    # Empty values are not duplicates, store them as NULL
+    for column in ('email', 'phone'):
+        cr.execute(
+            "UPDATE res_partner SET {0} = NULL WHERE {0} = ''".format(column))
+
+    # Report the values that prevent the unique indexes from being created,
+    # the index is added once they are cleaned up and the module is updated
+    # again.
+    for column in ('email', 'phone'):
+        cr.execute("""
+            SELECT {0}, array_agg(id ORDER BY id)
+              FROM res_partner
+             WHERE {0} IS NOT NULL
+          GROUP BY {0}
+            HAVING count(*) > 1
+        """.format(column))
+        duplicates = cr.fetchall()
+        for value, partner_ids in duplicates:
+            _logger.warning("res.partner: duplicated %s %r on partners %s",
+                            column, value, partner_ids)
+        if duplicates:
+            _logger.warning(
+                "res.partner: %d duplicated %s value(s), the %s unique index "
+                "will not be created until they are fixed",
+                len(duplicates), column, column)
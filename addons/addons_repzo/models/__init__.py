@@ -1 +1 @@
-from . import contact,product
\ No newline at end of file
+from . import contact,product,tombstone,ir_http,pricelist,product_image,sale_order,order_job,idempotency,account_move
\ No newline at end of file
@@ -0,0 +1,10 @@
+from odoo import models, tools
+
+
+class AccountMove(models.Model):
+    _inherit = 'account.move'
+
+    def init(self):
+        # keyset index of the updatedAt cursor of the invoice list
+        tools.create_index(self._cr, 'account_move_write_date_id_index',
+                           self._table, ['write_date', 'id'])
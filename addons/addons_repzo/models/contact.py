@@ -1,5 +1,15 @@
-from odoo import models, fields, api
-from odoo.exceptions import ValidationError
+from odoo import models, fields, api, tools
+from odoo.tools.lru import LRU
+from . import geo
+import logging
+import psycopg2
+
+_logger = logging.getLogger(__name__)
+
+# (database, id_repzo) -> partner id, kept by each worker. Entries are
+# dropped by the writes of this worker; callers must recheck hits against
+# the record since other workers cannot invalidate them.
+_repzo_id_cache = LRU(8192)
 
 
 class ResPartner(models.Model):
@@ -13,29 +23,144 @@ class ResPartner(models.Model):
     )
     payment_type = fields.Char(string="Payment Type", help="credit Or cash")
 
-    id_repzo = fields.Char(string="Repzo Id")
-
-    @api.constrains('email')
-    def _check_unique_email(self):
-        for record in self:
-            if record.email:
-                existing_partners = self.search([
-                    ('email', '=', record.email),
-                    ('id', '!=', record.id)  # Exclude the current record
-                ])
-                if existing_partners:
-                    raise ValidationError("The email address must be unique.")
-
-    @api.constrains('phone')
-    def _check_unique_phone(self):
-        for record in self:
-            if record.phone:
-                existing_partners = self.search([
-                    ('phone', '=', record.phone),
-                    ('id', '!=', record.id)  # Exclude the current record
-                ])
-                if existing_partners:
-                    raise ValidationError("The phone number must be unique.")
+    id_repzo = fields.Char(string="Repzo Id", index=True)
+
+    # Grid cell of the partner location, indexed to find nearby customers
+    geo_cell = fields.Char(string="Geo Cell", compute='_compute_geo_cell',
+                           store=True, index=True)
+
+    def init(self):
+        # keyset index for the incremental sync (write_date, id) watermark
+        tools.create_index(self._cr, 'res_partner_write_date_id_index',
+                           self._table, ['write_date', 'id'])
+
+        # Emails and phones are unique among the partners having one, by
+        # partial unique indexes instead of a search per record. Empty
+        # values are stored as NULL (see _repzo_empty_to_null), so the
+        # predicate stays implied by the `in` lookups of the bulk import.
+        # See migrations/1.2 for the report of the duplicates preventing
+        # their creation.
+        for column in ('email', 'phone'):
+            indexname = '%s_%s_unique_index' % (self._table, column)
+            if tools.index_exists(self._cr, indexname):
+                continue
+            try:
+                with self._cr.savepoint():
+                    self._cr.execute(
+                        'CREATE UNIQUE INDEX "{0}" ON "{1}" ("{2}") WHERE "{2}" IS NOT NULL'
+                        .format(indexname, self._table, column))
+            except psycopg2.IntegrityError:
+                _logger.warning("res.partner: duplicated %s values, the %s index "
+                                "is created once they are fixed", column, indexname)
+
+    @api.model
+    def _repzo_empty_to_null(self, vals):
+        # '' would be a value of the unique indexes, store NULL instead
+        for fname in ('email', 'phone'):
+            if fname in vals and not vals[fname]:
+                vals[fname] = False
+        return vals
+
+    @api.depends('partner_latitude', 'partner_longitude')
+    def _compute_geo_cell(self):
+        for partner in self:
+            if partner.partner_latitude or partner.partner_longitude:
+                partner.geo_cell = geo.cell_key(
+                    partner.partner_latitude, partner.partner_longitude)
+            else:
+                partner.geo_cell = False
+
+    @api.model
+    def _search_nearby(self, lat, lng, radius_km=None, limit=None):
+        """Return ``[(partner_id, distance_km)]`` sorted by distance.
+
+        Candidates are read from the cells covering the circle through the
+        ``geo_cell`` index, then filtered on their exact distance. Without
+        ``radius_km`` the circle grows until ``limit`` partners are found.
+        """
+        if radius_km is None and not limit:
+            raise ValueError("A radius or a limit is required.")
+        if radius_km is not None and not 0 < radius_km <= geo.MAX_RADIUS_KM:
+            raise ValueError("The radius must be between 0 and %s km." % geo.MAX_RADIUS_KM)
+
+        radius = radius_km or geo.GEO_CELL_SIZE * geo.KM_PER_DEGREE
+        searched = set()
+        found = []
+        while True:
+            cells = [cell for cell in geo.cells_around(lat, lng, radius)
+                     if cell not in searched]
+            searched.update(cells)
+            for partner in self.search_read([('geo_cell', 'in', cells)],
+                                            ['partner_latitude', 'partner_longitude']):
+                distance = geo.haversine_km(lat, lng, partner['partner_latitude'],
+                                            partner['partner_longitude'])
+                found.append((partner['id'], distance))
+            in_radius = [match for match in found if match[1] <= radius]
+            if radius_km is not None or len(in_radius) >= limit \
+                    or radius >= geo.MAX_RADIUS_KM:
+                break
+            radius = min(radius * 2, geo.MAX_RADIUS_KM)
+
+        in_radius.sort(key=lambda match: match[1])
+        return in_radius[:limit] if limit else in_radius
+
+    @api.model
+    def _resolve_repzo_ids(self, repzo_ids):
+        """Return ``{id_repzo: partner_id}`` for the known Repzo ids, using
+        the worker cache and one indexed query for the cache misses."""
+        dbname = self.env.cr.dbname
+        resolved, missing = {}, []
+        for repzo_id in set(repzo_ids):
+            partner_id = _repzo_id_cache.get((dbname, repzo_id))
+            if partner_id:
+                resolved[repzo_id] = partner_id
+            else:
+                missing.append(repzo_id)
+        if missing:
+            for partner in self.search_read([('id_repzo', 'in', missing)], ['id_repzo']):
+                resolved[partner['id_repzo']] = partner['id']
+                _repzo_id_cache[dbname, partner['id_repzo']] = partner['id']
+        return resolved
+
+    @api.model
+    def _forget_repzo_ids(self, repzo_ids):
+        dbname = self.env.cr.dbname
+        for repzo_id in repzo_ids:
+            if repzo_id and (dbname, repzo_id) in _repzo_id_cache:
+                try:
+                    del _repzo_id_cache[dbname, repzo_id]
+                except KeyError:
+                    pass  # dropped by another thread meanwhile
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        for vals in vals_list:
+            self._repzo_empty_to_null(vals)
+        partners = super(ResPartner, self).create(vals_list)
+        self._forget_repzo_ids(partners.mapped('id_repzo'))
+        return partners
+
+    def write(self, vals):
+        self._repzo_empty_to_null(vals)
+        if 'id_repzo' in vals or 'active' in vals:
+            self._forget_repzo_ids(self.mapped('id_repzo') + [vals.get('id_repzo')])
+        archived = restored = self.browse()
+        if 'active' in vals:
+            if vals['active']:
+                restored = self.filtered(lambda partner: not partner.active)
+            else:
+                archived = self.filtered('active')
+        res = super(ResPartner, self).write(vals)
+        if archived:
+            self.env['repzo.tombstone']._record(archived, 'archived')
+        if restored:
+            self.env['repzo.tombstone']._forget(restored)
+        return res
+
+    def unlink(self):
+        self.env['repzo.tombstone']._record(self, 'deleted')
+        self._forget_repzo_ids(self.mapped('id_repzo'))
+        return super(ResPartner, self).unlink()
 
     # @api.constrains('id_repzo')
     # def _check_unique_id_repzo(self):
@@ -0,0 +1,34 @@
+import math
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+
+# Side of a grid cell in degrees, about 5.5 km of latitude
+GEO_CELL_SIZE = 0.05
+
+# Keeps the number of cells looked up per query bounded
+MAX_RADIUS_KM = 50.0
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + \
+        math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def cell_key(lat, lng):
+    return "%d:%d" % (math.floor(lat / GEO_CELL_SIZE), math.floor(lng / GEO_CELL_SIZE))
+
+
+def cells_around(lat, lng, radius_km):
+    """Keys of every cell intersecting the bounding box of the circle."""
+    dlat = radius_km / KM_PER_DEGREE
+    # longitude degrees shrink with the latitude, use the widest edge
+    edge = min(abs(lat) + dlat, 89.0)
+    dlng = min(radius_km / (KM_PER_DEGREE * math.cos(math.radians(edge))), 180.0)
+    lat_cells = range(math.floor((lat - dlat) / GEO_CELL_SIZE),
+                      math.floor((lat + dlat) / GEO_CELL_SIZE) + 1)
+    lng_cells = range(math.floor((lng - dlng) / GEO_CELL_SIZE),
+                      math.floor((lng + dlng) / GEO_CELL_SIZE) + 1)
+    return ["%d:%d" % (i, j) for i in lat_cells for j in lng_cells]
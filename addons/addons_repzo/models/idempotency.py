@@ -0,0 +1,83 @@
+import json
+
+from odoo import models, fields, api
+
+# How long a stored response answers the retries of a request
+IDEMPOTENCY_TTL_HOURS = 24
+
+
+class RepzoIdempotencyKey(models.Model):
+    _name = 'repzo.idempotency.key'
+    _description = 'Repzo Idempotency Key'
+    _order = 'id'
+
+    key = fields.Char(string="Key", required=True)
+    user_id = fields.Many2one('res.users', string="User", required=True,
+                              ondelete='cascade')
+    endpoint = fields.Char(string="Endpoint", required=True)
+    response = fields.Text(string="Response")
+    expires_at = fields.Datetime(string="Expires At", required=True, index=True)
+
+    _sql_constraints = [
+        ('key_user_uniq', 'unique(key, user_id)',
+         "The idempotency key must be unique per user."),
+    ]
+
+    @api.model
+    def _acquire(self, key, user_id, endpoint):
+        """Lock ``key`` of ``user_id`` until the end of the transaction.
+
+        Returns the response stored by a previous call, or ``None`` when the
+        request has to be processed. A concurrent call with the same key
+        waits on the row lock and then gets the response of the first one.
+        """
+        ttl = int(self.env['ir.config_parameter'].sudo().get_param(
+            'addons_repzo.idempotency_ttl_hours', IDEMPOTENCY_TTL_HOURS))
+        self.env.cr.execute("""
+            INSERT INTO repzo_idempotency_key
+                   (key, user_id, endpoint, expires_at, create_uid, create_date,
+                    write_uid, write_date)
+            VALUES (%(key)s, %(user_id)s, %(endpoint)s,
+                    (now() at time zone 'UTC') + %(ttl)s * interval '1 hour',
+                    %(user_id)s, now() at time zone 'UTC',
+                    %(user_id)s, now() at time zone 'UTC')
+            ON CONFLICT (key, user_id) DO NOTHING
+        """, {'key': key, 'user_id': user_id, 'endpoint': endpoint, 'ttl': ttl})
+        self.env.cr.execute("""
+            SELECT id, endpoint, response, expires_at < (now() at time zone 'UTC')
+              FROM repzo_idempotency_key
+             WHERE key = %s AND user_id = %s
+               FOR UPDATE
+        """, (key, user_id))
+        key_id, stored_endpoint, response, expired = self.env.cr.fetchone()
+
+        if response is not None and not expired:
+            if stored_endpoint != endpoint:
+                raise ValueError("The idempotency key was used for another request.")
+            return json.loads(response)
+        if expired:
+            self.env.cr.execute("""
+                UPDATE repzo_idempotency_key
+                   SET endpoint = %s, response = NULL,
+                       expires_at = (now() at time zone 'UTC') + %s * interval '1 hour'
+                 WHERE id = %s
+            """, (endpoint, ttl, key_id))
+        return None
+
+    @api.model
+    def _store(self, key, user_id, response):
+        """Keep a successful ``response``; errors release the key so the
+        client can retry them (the caller rolled back their changes)."""
+        if isinstance(response, dict) and response.get('status') == 'error':
+            self.env.cr.execute("""
+                DELETE FROM repzo_idempotency_key WHERE key = %s AND user_id = %s
+            """, (key, user_id))
+        else:
+            self.env.cr.execute("""
+                UPDATE repzo_idempotency_key SET response = %s
+                 WHERE key = %s AND user_id = %s
+            """, (json.dumps(response), key, user_id))
+
+    @api.autovacuum
+    def _gc_keys(self):
+        self.sudo().search([('expires_at', '<', fields.Datetime.now())]).unlink()
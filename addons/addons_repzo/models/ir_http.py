@@ -0,0 +1,14 @@
+from odoo import models
+from odoo.http import request
+
+
+class IrHttp(models.AbstractModel):
+    _inherit = 'ir.http'
+
+    @classmethod
+    def _post_dispatch(cls, response):
+        super(IrHttp, cls)._post_dispatch(response)
+        # Set by controllers/http_cache.py when the client copy is still valid
+        if getattr(request, 'repzo_not_modified', False):
+            response.status_code = 304
+            response.set_data(b'')
@@ -0,0 +1,194 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import json
+import logging
+import threading
+
+import odoo
+from odoo import models, fields, api
+
+_logger = logging.getLogger(__name__)
+
+# How long finished jobs are kept for clients polling their status
+JOB_RETENTION_DAYS = 7
+# A running job silent for longer than this was killed with its runner
+JOB_TIMEOUT_MINUTES = 60
+MAX_ATTEMPTS = 3
+
+
+def _drain_in_thread(dbname, uid, context, batch_size):
+    # an extra runner, with its own cursor and transactions
+    threading.current_thread().dbname = dbname
+    with odoo.registry(dbname).cursor() as cr:
+        api.Environment(cr, uid, context)['repzo.order.job']._drain(batch_size)
+
+
+class RepzoOrderJob(models.Model):
+    _name = 'repzo.order.job'
+    _description = 'Repzo Order Job'
+    _order = 'id'
+
+    user_id = fields.Many2one('res.users', string="User", required=True,
+                              ondelete='cascade', index=True)
+    job_type = fields.Selection([
+        ('order_invoice', 'Order With Invoice'),
+        ('mass_invoice', 'Mass Invoicing'),
+    ], string="Type", default='order_invoice', required=True)
+    payload = fields.Text(string="Payload", required=True)
+    state = fields.Selection([
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ], string="State", default='pending', required=True, index=True)
+    result = fields.Text(string="Result")
+    error = fields.Char(string="Error")
+    date_started = fields.Datetime(string="Started At")
+    date_done = fields.Datetime(string="Done At")
+    attempts = fields.Integer(string="Attempts", default=0)
+    progress_done = fields.Integer(string="Processed", default=0)
+    progress_total = fields.Integer(string="To Process", default=0)
+
+    @api.model
+    def _enqueue(self, payload, user_id, job_type='order_invoice'):
+        """Queue the validated ``payload`` of ``user_id`` and wake a runner up."""
+        job = self.sudo().create({
+            'user_id': user_id,
+            'job_type': job_type,
+            'payload': json.dumps(payload),
+        })
+        self.env.ref('addons_repzo.ir_cron_order_job_queue')._trigger()
+        return job
+
+    @api.model
+    def _claim_next(self):
+        # SKIP LOCKED lets several runners drain the queue side by side, each
+        # one only sees the jobs nobody else is processing.
+        self.env.cr.execute("""
+            SELECT id FROM repzo_order_job
+             WHERE state = 'pending'
+             ORDER BY id
+             LIMIT 1
+               FOR UPDATE SKIP LOCKED
+        """)
+        row = self.env.cr.fetchone()
+        return self.browse(row[0]) if row else self.browse()
+
+    @api.model
+    def _process_queue(self):
+        get_param = self.env['ir.config_parameter'].sudo().get_param
+        batch_size = int(get_param('addons_repzo.order_job_batch_size', 50))
+        runners = max(int(get_param('addons_repzo.order_job_runners', 1)), 1)
+        self._requeue_stale(int(get_param(
+            'addons_repzo.order_job_timeout_minutes', JOB_TIMEOUT_MINUTES)))
+
+        # The cron thread is the first runner, the others run in threads
+        # using one database connection each. SKIP LOCKED keeps them apart.
+        with ThreadPoolExecutor(max_workers=runners) as executor:
+            futures = [
+                executor.submit(_drain_in_thread, self.env.cr.dbname, self.env.uid,
+                                dict(self.env.context), batch_size)
+                for _ in range(runners - 1)
+            ]
+            self._drain(batch_size)
+        for future in futures:
+            future.result()
+
+        # more than a batch per runner was queued, go on right away
+        # instead of waiting for the next interval
+        if self.search([('state', '=', 'pending')], limit=1):
+            self.env.ref('addons_repzo.ir_cron_order_job_queue')._trigger()
+
+    @api.model
+    def _requeue_stale(self, timeout):
+        # Only jobs committing along the way (mass invoicing) are seen as
+        # running by other transactions; they write their progress after
+        # each chunk, so a job silent for ``timeout`` lost its runner
+        # (killed by limit_time_real_cron, a restart...). What it committed
+        # is done, the next run goes on with the rest.
+        stale = self.search([
+            ('state', '=', 'running'),
+            ('write_date', '<', fields.Datetime.now() - timedelta(minutes=timeout)),
+        ])
+        for job in stale:
+            _logger.warning("Order job %s stopped running since %s, attempt %s",
+                            job.id, job.write_date, job.attempts)
+            if job.attempts >= MAX_ATTEMPTS:
+                job.write({'state': 'failed', 'error': "Timed out.",
+                           'date_done': fields.Datetime.now()})
+            else:
+                job.state = 'pending'
+        if stale:
+            self.env.cr.commit()
+
+    @api.model
+    def _drain(self, batch_size):
+        for _ in range(batch_size):
+            job = self._claim_next()
+            if not job:
+                break
+            job._run()
+            # release the row lock and publish the result to the pollers
+            self.env.cr.commit()
+
+    def _run(self):
+        self.ensure_one()
+        self.write({'state': 'running', 'date_started': fields.Datetime.now(),
+                    'attempts': self.attempts + 1})
+        try:
+            if self.job_type == 'mass_invoice':
+                # commits along the way to publish its progress
+                result = self._run_mass_invoice()
+            else:
+                with self.env.cr.savepoint():
+                    orders = self.env['sale.order'].with_user(self.user_id)
+                    result = orders._repzo_create_with_invoice(json.loads(self.payload))
+        except Exception as e:
+            _logger.info("Order job %s failed: %s", self.id, e)
+            result = {"status": "error", "message": str(e)}
+        self.write({
+            'state': 'done' if result.get('status') == 'success' else 'failed',
+            'result': json.dumps(result),
+            'error': False if result.get('status') == 'success'
+            else result.get('message', '')[:250],
+            'date_done': fields.Datetime.now(),
+        })
+
+    def _run_mass_invoice(self):
+        payload = json.loads(self.payload)
+        chunk_size = int(self.env['ir.config_parameter'].sudo().get_param(
+            'addons_repzo.invoice_chunk_size', 100))
+        orders = self.env['sale.order'].with_user(self.user_id)._repzo_invoiceable(
+            payload.get('order_ids'), payload.get('domain'))
+        # a requeued job goes on with the orders its first run left
+        self.progress_total = self.progress_done + len(orders)
+        self.env.cr.commit()
+
+        invoice_ids, failed = [], {}
+        for chunk in orders._repzo_invoice_chunks(chunk_size):
+            try:
+                with self.env.cr.savepoint():
+                    invoices = chunk._create_invoices()
+                    invoices.action_post()
+                invoice_ids += invoices.ids
+            except Exception as e:
+                _logger.info("Mass invoicing of orders %s failed: %s", chunk.ids, e)
+                self.env.invalidate_all()
+                failed.update({order_id: str(e) for order_id in chunk.ids})
+            self.progress_done += len(chunk)
+            self.env.cr.commit()
+
+        return {
+            "status": "success",
+            "invoice_ids": invoice_ids,
+            "failed_orders": [{"order_id": order_id, "message": message}
+                              for order_id, message in failed.items()],
+        }
+
+    @api.autovacuum
+    def _gc_jobs(self):
+        limit = fields.Datetime.now() - timedelta(days=JOB_RETENTION_DAYS)
+        self.sudo().search([
+            ('state', 'in', ('done', 'failed')),
+            ('date_done', '<', limit),
+        ]).unlink()
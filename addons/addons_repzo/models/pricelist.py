@@ -0,0 +1,68 @@
+from odoo import models, fields, api
+from odoo.tools.lru import LRU
+
+# (database, company, pricelist, items version, product, product version,
+#  quantity, date) -> price, kept by each worker
+_price_cache = LRU(65536)
+
+
+class ProductPricelist(models.Model):
+    _inherit = 'product.pricelist'
+
+    def _repzo_prices(self, product_ids, quantity):
+        """Return ``{product_id: price}`` for the existing products.
+
+        Prices come from the worker cache, the missing ones are computed in
+        one batched pricelist evaluation. The keys hold a version of the
+        pricelist items and of each product so entries cached before a change
+        made by another worker are never used.
+        """
+        self.ensure_one()
+        if not product_ids:
+            return {}
+        cr = self.env.cr
+        cr.execute("SELECT count(*), max(write_date) FROM product_pricelist_item")
+        items_version = cr.fetchone()
+        cr.execute("""
+            SELECT product.id, greatest(product.write_date, template.write_date)
+              FROM product_product product
+              JOIN product_template template ON template.id = product.product_tmpl_id
+             WHERE product.id IN %s
+        """, [tuple(product_ids)])
+        today = fields.Date.context_today(self)
+        keys = {
+            product_id: (cr.dbname, self.env.company.id, self.id, items_version,
+                         product_id, version, quantity, today)
+            for product_id, version in cr.fetchall()
+        }
+
+        prices, missing = {}, []
+        for product_id, key in keys.items():
+            price = _price_cache.get(key)
+            if price is None:
+                missing.append(product_id)
+            else:
+                prices[product_id] = price
+        if missing:
+            computed = self._get_products_price(
+                self.env['product.product'].browse(missing), quantity)
+            for product_id, price in computed.items():
+                prices[product_id] = _price_cache[keys[product_id]] = price
+        return prices
+
+
+class ProductPricelistItem(models.Model):
+    _inherit = 'product.pricelist.item'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        _price_cache.clear()
+        return super(ProductPricelistItem, self).create(vals_list)
+
+    def write(self, vals):
+        _price_cache.clear()
+        return super(ProductPricelistItem, self).write(vals)
+
+    def unlink(self):
+        _price_cache.clear()
+        return super(ProductPricelistItem, self).unlink()
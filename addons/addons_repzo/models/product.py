@@ -1,11 +1,49 @@
-from odoo import models, fields, api
+from odoo import models, fields, api, tools
+import hashlib
+import logging
+import psycopg2
+
+_logger = logging.getLogger(__name__)
+
+
+def _table_stamp(*models):
+    """Version of the content of the tables of ``models``, archived records
+    included: their number of rows and latest ``write_date`` change with
+    every create, write and unlink. One query per model, nothing on writes."""
+    stamps = []
+    for model in models:
+        model.flush_model()
+        model.env.cr.execute(
+            'SELECT count(*), max(write_date) FROM "%s"' % model._table)
+        stamps.append((model._name,) + model.env.cr.fetchone())
+    return hashlib.sha1(repr(stamps).encode()).hexdigest()[:20]
+
+
+TREE_VERSION_KEY = 'product.category.tree'
+
+
+def _bump_version(cr, key):
+    """Change the version of ``key`` to the id of the current transaction,
+    unique over the life of the database. Repeated bumps within a
+    transaction leave the row as it is."""
+    cr.execute("""
+        INSERT INTO repzo_version (key, version) VALUES (%s, txid_current())
+        ON CONFLICT (key) DO UPDATE SET version = EXCLUDED.version
+         WHERE repzo_version.version <> EXCLUDED.version
+    """, [key])
+
+
+def _read_version(cr, key):
+    cr.execute("SELECT version FROM repzo_version WHERE key = %s", [key])
+    row = cr.fetchone()
+    return str(row[0]) if row else '0'
 
 
 class Brand(models.Model):
     _name = 'product.brand'
     _description = 'Product Brand'
 
-    _id = fields.Char(string="_id", required=True)
+    _id = fields.Char(string="_id", required=True, index=True)
     name = fields.Char(string='Brand Name', required=True)
     disabled = fields.Boolean(string='Disabled', default=False)
     company_namespace = fields.Many2many(
@@ -16,31 +54,110 @@ class Brand(models.Model):
     updated_at = fields.Datetime(
         string='Updated At', readonly=True, default=fields.Datetime.now)
 
-    @api.model
-    def create(self, vals):
-        if 'id' in vals:
-            existing_brand = self.search([('id', '=', vals['id'])])
-            if existing_brand:
-                raise ValueError("The ID must be unique.")
-
-        # Set created_at and updated_at fields
-        vals['created_at'] = fields.Datetime.now()
-        return super(Brand, self).create(vals)
+    @api.model_create_multi
+    def create(self, vals_list):
+        for vals in vals_list:
+            # Set created_at and updated_at fields
+            vals['created_at'] = fields.Datetime.now()
+        return super(Brand, self).create(vals_list)
 
     def write(self, vals):
         # Update the updated_at field whenever the record is modified
         vals['updated_at'] = fields.Datetime.now()
         return super(Brand, self).write(vals)
 
+    @api.model
+    def _list_version(self):
+        # company names are part of the brand list
+        return _table_stamp(self.with_context(active_test=False),
+                            self.env['res.company'])
+
 
 class ProductCategory(models.Model):
     _inherit = 'product.category'
-    _id = fields.Char(string='_id', default="")
+    _id = fields.Char(string='_id', default="", index=True)
     disabled = fields.Boolean(string='disabled', default=False)
     position = fields.Integer(string="position")
     local_name = fields.Char(string="local Name")
     type = fields.Char(string="type")
 
+    def init(self):
+        # Versions of cached listings, one row each, bumped by the writes
+        # that change them: reading one is a primary key lookup
+        self._cr.execute("""
+            CREATE TABLE IF NOT EXISTS repzo_version (
+                key varchar PRIMARY KEY,
+                version bigint NOT NULL
+            )
+        """)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        categories = super(ProductCategory, self).create(vals_list)
+        _bump_version(self.env.cr, TREE_VERSION_KEY)
+        return categories
+
+    def write(self, vals):
+        _bump_version(self.env.cr, TREE_VERSION_KEY)
+        return super(ProductCategory, self).write(vals)
+
+    def unlink(self):
+        _bump_version(self.env.cr, TREE_VERSION_KEY)
+        return super(ProductCategory, self).unlink()
+
+    @api.model
+    def _tree_version(self):
+        return _read_version(self.env.cr, TREE_VERSION_KEY)
+
+    @api.model
+    def _repzo_tree(self, include_disabled=False):
+        """Return the category hierarchy as nested dicts, with the number of
+        product templates of each category and of its whole subtree.
+
+        Categories are read ordered by ``parent_path`` so every parent comes
+        before its children and the tree is built in a single pass.
+        """
+        categories = self.search_read(
+            [], ['_id', 'name', 'local_name', 'type', 'position', 'disabled', 'parent_id'],
+            order='parent_path', load=None)
+        counts = {
+            group['categ_id'][0]: group['categ_id_count']
+            for group in self.env['product.template'].read_group(
+                [('categ_id', 'in', [category['id'] for category in categories])],
+                ['categ_id'], ['categ_id'])
+        }
+
+        nodes, roots = {}, []
+        for category in categories:
+            parent = category['parent_id']
+            # disabled categories are left out with their whole subtree
+            if (category['disabled'] and not include_disabled) or \
+                    (parent and parent not in nodes):
+                continue
+            node = nodes[category['id']] = {
+                "id": category['id'],
+                "_id": category['_id'] or "",
+                "name": category['name'] or "",
+                "local_name": category['local_name'] or "",
+                "type": category['type'] or "",
+                "position": category['position'] or 0,
+                "disabled": category['disabled'],
+                "product_count": counts.get(category['id'], 0),
+                "total_product_count": counts.get(category['id'], 0),
+                "children": [],
+            }
+            (nodes[parent]["children"] if parent else roots).append(node)
+
+        # children come after their parent, add the subtree counts bottom-up
+        for category in reversed(categories):
+            node, parent = nodes.get(category['id']), category['parent_id']
+            if node and parent:
+                nodes[parent]["total_product_count"] += node["total_product_count"]
+
+        for children in [roots] + [node["children"] for node in nodes.values()]:
+            children.sort(key=lambda node: (node["position"], node["name"]))
+        return roots
+
 
 class ProductTemplate(models.Model):
     _inherit = 'product.template'
@@ -50,3 +167,151 @@ class ProductTemplate(models.Model):
         'product.brand', string='Brand', ondelete='set null')
     frozen_pre_sales = fields.Boolean(string="frozen_pre_sales", default=True)
     frozen_sales = fields.Boolean(string="frozen_sales", default=True)
+
+    def init(self):
+        # Name and price sort keys of the product list, alone and within a
+        # category filter, for the inner template join of
+        # product.product._template_sorted_query. Names sort on the
+        # expression of the language (languages installed later are indexed
+        # by the next module update).
+        sort_keys = {'list_price': '"list_price"'}
+        for lang, _ in self.env['res.lang'].get_installed():
+            sort_keys['name_%s' % lang.lower()] = self._repzo_name_sort_expression(lang)
+        for key, expression in sort_keys.items():
+            tools.create_index(self._cr, 'product_template_repzo_%s_index' % key,
+                               self._table, ['(%s)' % expression])
+            tools.create_index(self._cr, 'product_template_repzo_categ_%s_index' % key,
+                               self._table, ['categ_id', '(%s)' % expression])
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        templates = super(ProductTemplate, self).create(vals_list)
+        _bump_version(self.env.cr, TREE_VERSION_KEY)
+        return templates
+
+    def write(self, vals):
+        # the category tree counts the active templates of each category
+        if 'categ_id' in vals or 'active' in vals:
+            _bump_version(self.env.cr, TREE_VERSION_KEY)
+        return super(ProductTemplate, self).write(vals)
+
+    def unlink(self):
+        _bump_version(self.env.cr, TREE_VERSION_KEY)
+        return super(ProductTemplate, self).unlink()
+
+    @api.model
+    def _repzo_name_sort_expression(self, lang):
+        # the expression the ORM orders translated names by
+        if lang == 'en_US':
+            return """"name"->>'en_US'"""
+        return """COALESCE("name"->>'%s', "name"->>'en_US')""" % lang
+
+    def _default_variant_ids(self):
+        """Return ``{template_id: variant_id}`` holding the first active
+        variant of each template (variant order), one row per template."""
+        if not self:
+            return {}
+        Product = self.env['product.product']
+        Product.flush_model(['product_tmpl_id', 'priority', 'default_code', 'active'])
+        query = Product._where_calc([('product_tmpl_id', 'in', self.ids)])
+        Product._apply_ir_rules(query, 'read')
+        variants_sql, params = query.select(
+            '"product_product"."id"', '"product_product"."product_tmpl_id"',
+            '"product_product"."priority"', '"product_product"."default_code"')
+        # the variant order within a template: priority desc, default_code, id
+        self.env.cr.execute("""
+            SELECT DISTINCT ON (product_tmpl_id) product_tmpl_id, id
+              FROM ({}) AS variants
+             ORDER BY product_tmpl_id, priority DESC, default_code, id
+        """.format(variants_sql), params)
+        return dict(self.env.cr.fetchall())
+
+
+class ProductProduct(models.Model):
+    _inherit = 'product.product'
+
+    # Lowercased names (all installed languages), local name, internal
+    # reference and barcode, indexed with pg_trgm for the API search
+    repzo_search_text = fields.Char(
+        string="Search Text", compute='_compute_repzo_search_text', store=True)
+
+    def init(self):
+        # Sort key of the product list, on active products (id tie-breaker)
+        tools.create_index(self._cr, 'product_product_active_create_date_id_index',
+                           self._table, ['create_date', 'id'], where='active')
+        # updatedAt sort and keyset cursor, archived products included
+        tools.create_index(self._cr, 'product_product_write_date_id_index',
+                           self._table, ['write_date', 'id'])
+
+        self.env.cr.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        if not self.env.cr.fetchone():
+            try:
+                with self.env.cr.savepoint():
+                    self.env.cr.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            except psycopg2.Error:
+                _logger.warning("pg_trgm is not available, the product search "
+                                "text will not be indexed")
+                return
+        tools.create_index(self._cr, 'product_product_repzo_search_text_trgm_index',
+                           self._table, ['repzo_search_text gin_trgm_ops'], method='gin')
+
+    @api.depends('product_tmpl_id.name', 'product_tmpl_id.local_name',
+                 'default_code', 'barcode')
+    def _compute_repzo_search_text(self):
+        langs = [code for code, _ in self.env['res.lang'].get_installed()]
+        for product in self:
+            template = product.product_tmpl_id
+            terms = [template.with_context(lang=lang).name for lang in langs]
+            terms += [template.local_name, product.default_code, product.barcode]
+            product.repzo_search_text = ' '.join(
+                dict.fromkeys(term.lower() for term in terms if term))
+
+    @api.model
+    def _search_text_domain(self, text):
+        return [('repzo_search_text', '=like',
+                 '%%%s%%' % tools.escape_psql(text.strip().lower()))]
+
+    @api.model
+    def _search_ranked(self, text, domain=None, offset=0, limit=None):
+        """Return the ids of the products matching ``domain``, which holds
+        the :meth:`_search_text_domain` of ``text``, most relevant first:
+        prefix matches, then by trigram word similarity."""
+        text = text.strip().lower()
+        query = self._where_calc(list(domain or []))
+        self._apply_ir_rules(query, 'read')
+        matches_sql, params = query.select(
+            '"product_product"."id"', '"product_product"."repzo_search_text"')
+
+        prefix = tools.escape_psql(text) + '%'
+        # without pg_trgm, earlier occurrences rank first
+        relevance = "word_similarity(%s, repzo_search_text) DESC" \
+            if self.env.registry.has_trigram else "strpos(repzo_search_text, %s)"
+        self.env.cr.execute("""
+            SELECT id FROM ({}) AS matches
+             ORDER BY (repzo_search_text LIKE %s OR repzo_search_text LIKE %s) DESC,
+                      {}, id
+             LIMIT %s OFFSET %s
+        """.format(matches_sql, relevance),
+            list(params) + [prefix, '% ' + prefix, text, limit, offset])
+        return [row[0] for row in self.env.cr.fetchall()]
+
+    @api.model
+    def _template_sorted_query(self, domain, order, offset=0, limit=None, categ_id=None):
+        """Return the query of the products matching ``domain`` in
+        ``order``, which sorts on template fields (name, list price).
+
+        The ORM orders through a LEFT JOIN on the template, which keeps
+        product_product as the driving table whatever the template indexes.
+        Requiring the joined template, and filtering its category on it,
+        makes it an inner join the template sort indexes can drive."""
+        query = self._where_calc(list(domain))
+        self._apply_ir_rules(query, 'read')
+        query.order = self._generate_order_by(order, query).replace('ORDER BY ', '')
+        template = query.left_join(self._table, 'product_tmpl_id', 'product_template',
+                                   'id', 'product_tmpl_id')
+        if categ_id:
+            query.add_where('"%s"."categ_id" = %%s' % template, [int(categ_id)])
+        else:
+            query.add_where('"%s"."id" IS NOT NULL' % template)
+        query.limit, query.offset = limit, offset
+        return query
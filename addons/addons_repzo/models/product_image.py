@@ -0,0 +1,133 @@
+from concurrent.futures import ThreadPoolExecutor
+from collections import defaultdict
+from datetime import timedelta
+import base64
+import hashlib
+import logging
+
+import requests
+
+from odoo import models, fields, api
+
+_logger = logging.getLogger(__name__)
+
+IMAGE_TIMEOUT = 20
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+MAX_ATTEMPTS = 3
+# Delay before the first retry of a failed download, doubled on each attempt
+RETRY_DELAY_MINUTES = 5
+
+
+def fetch_image(url, timeout=IMAGE_TIMEOUT):
+    response = requests.get(url, timeout=timeout, stream=True)
+    response.raise_for_status()
+    content = response.raw.read(MAX_IMAGE_BYTES + 1, decode_content=True)
+    if len(content) > MAX_IMAGE_BYTES:
+        raise ValueError("The image is larger than %d bytes." % MAX_IMAGE_BYTES)
+    return content
+
+
+class RepzoProductImage(models.Model):
+    _name = 'repzo.product.image'
+    _description = 'Repzo Product Image Download'
+    _order = 'id'
+
+    product_tmpl_id = fields.Many2one('product.template', string="Product",
+                                      required=True, ondelete='cascade', index=True)
+    url = fields.Char(string="URL", required=True)
+    state = fields.Selection([
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ], string="State", default='pending', required=True, index=True)
+    content_hash = fields.Char(string="Content Hash")
+    attempts = fields.Integer(string="Attempts", default=0)
+    next_attempt = fields.Datetime(string="Next Attempt")
+    error = fields.Char(string="Error")
+
+    @api.model
+    def _enqueue(self, urls_by_template):
+        """Queue ``{template_id: url}`` and wake the download cron up."""
+        jobs = self.sudo().create([
+            {'product_tmpl_id': template_id, 'url': url}
+            for template_id, url in urls_by_template.items() if url
+        ])
+        if jobs:
+            self.env.ref('addons_repzo.ir_cron_product_image_queue')._trigger()
+        return jobs
+
+    @api.model
+    def _pending_domain(self):
+        return [('state', '=', 'pending'),
+                '|', ('next_attempt', '=', False),
+                ('next_attempt', '<=', fields.Datetime.now())]
+
+    @api.model
+    def _process_queue(self):
+        get_param = self.env['ir.config_parameter'].sudo().get_param
+        batch_size = int(get_param('addons_repzo.image_batch_size', 200))
+        workers = int(get_param('addons_repzo.image_workers', 4))
+
+        cron = self.env.ref('addons_repzo.ir_cron_product_image_queue')
+        jobs = self.search(self._pending_domain(), limit=batch_size)
+        if not jobs:
+            return
+        # a full batch may not be the last one, run again right away
+        # instead of waiting for the next interval
+        if len(jobs) == batch_size:
+            cron._trigger()
+
+        # Identical URLs are downloaded once, by a bounded pool of threads
+        # that only do HTTP; the ORM is used from this thread only.
+        urls = list(set(jobs.mapped('url')))
+        downloaded = {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {url: executor.submit(fetch_image, url) for url in urls}
+        for url, future in futures.items():
+            try:
+                downloaded[url] = future.result()
+            except Exception as e:
+                downloaded[url] = e
+
+        # Identical contents are written once, on all their products
+        by_hash, contents = defaultdict(lambda: self.browse()), {}
+        for job in jobs:
+            content = downloaded[job.url]
+            if isinstance(content, Exception):
+                job._fail(content)
+                continue
+            content_hash = hashlib.sha256(content).hexdigest()
+            contents[content_hash] = content
+            by_hash[content_hash] |= job
+
+        for content_hash, hash_jobs in by_hash.items():
+            try:
+                with self.env.cr.savepoint():
+                    hash_jobs.product_tmpl_id.write({
+                        'image_1920': base64.b64encode(contents[content_hash]),
+                    })
+            except Exception as e:
+                hash_jobs._fail(e, retry=False)
+                continue
+            hash_jobs.write({'state': 'done', 'content_hash': content_hash,
+                             'error': False, 'next_attempt': False})
+
+        # wake up for the earliest retry
+        retry = self.search([('state', '=', 'pending'),
+                             ('next_attempt', '>', fields.Datetime.now())],
+                            order='next_attempt', limit=1)
+        if retry:
+            cron._trigger(at=retry.next_attempt)
+
+    def _fail(self, error, retry=True):
+        for job in self:
+            _logger.info("Product image %s of %s failed: %s",
+                         job.url, job.product_tmpl_id.display_name, error)
+            attempts = job.attempts + 1
+            delay = timedelta(minutes=RETRY_DELAY_MINUTES * 2 ** (attempts - 1))
+            job.write({
+                'attempts': attempts,
+                'error': str(error)[:250],
+                'state': 'pending' if retry and attempts < MAX_ATTEMPTS else 'failed',
+                'next_attempt': fields.Datetime.now() + delay,
+            })
@@ -0,0 +1,177 @@
+from collections import defaultdict
+
+from odoo import models, api, tools
+from odoo.osv import expression
+
+
+class SaleOrder(models.Model):
+    _inherit = 'sale.order'
+
+    def init(self):
+        # Filters of the order list: partner, then state, then date range
+        tools.create_index(self._cr, 'sale_order_partner_state_date_order_index',
+                           self._table, ['partner_id', 'state', 'date_order'])
+        # keyset index of the updatedAt cursor
+        tools.create_index(self._cr, 'sale_order_write_date_id_index',
+                           self._table, ['write_date', 'id'])
+
+    @api.model
+    def _repzo_create_with_invoice(self, validated_data):
+        """Create, confirm, deliver and invoice an order from the validated
+        payload of /api/add_order_invoice, return the API response."""
+        # Step 1: Create the order
+        order_data = {
+            'partner_id': validated_data['partner_id'],
+            'order_line': [(0, 0, {
+                'product_id': line['product_id'],
+                'product_uom_qty': line.get('quantity', 1),
+                'price_unit': line['price_unit']
+            }) for line in validated_data['order_line']],
+        }
+
+        order = self.create(order_data)
+
+        # Step 2: Confirm the order
+        order.action_confirm()
+
+        # Step 3: Validate stock picking (Inventory Movement)
+        pickings = order.picking_ids
+        pickings.filtered(lambda picking: picking.state == 'draft').action_confirm()
+        pickings.filtered(
+            lambda picking: picking.state in ['confirmed', 'waiting', 'assigned']
+        ).action_assign()
+        assigned = pickings.filtered(lambda picking: picking.state == 'assigned')
+
+        # A negative qty_done sends the delivered goods back
+        is_return = validated_data.get('qty_done', 0) < 0
+        if not is_return:
+            self._repzo_fill_qty_done(assigned.move_ids_without_package)
+
+        if assigned:
+            assigned.button_validate()  # Validate every delivery at once
+
+        # Process return if any negative quantities exist
+        return_pickings = []  # Store return picking records
+        if is_return:
+            return_pickings = self._repzo_return_moves({
+                move.id: abs(validated_data['qty_done'])
+                for move in assigned.move_ids_without_package if move.move_line_ids
+            })
+
+        # Step 4: Ensure Picking Validation Before Invoicing
+        invoice = None
+        all_pickings_validated = all(
+            picking.state == 'done' for picking in order.picking_ids)
+
+        if order.invoice_status != 'no':
+            if all_pickings_validated:
+                invoice = order._create_invoices()
+                invoice.action_post()
+            else:
+                return {
+                    "status": "error",
+                    "message": "Cannot create an invoice because the delivery is not yet validated."
+                }
+
+        return {
+            "status": "success",
+            "order_id": order.id,
+            "invoice_id": invoice.id if invoice else None,
+            "picking_ids": [picking.id for picking in order.picking_ids],
+            "return_picking_ids": return_pickings,
+        }
+
+    @api.model
+    def _repzo_fill_qty_done(self, moves):
+        """Every move line gets the full quantity of its move, with one
+        write per distinct quantity instead of one per line."""
+        lines_by_qty = defaultdict(lambda: self.env['stock.move.line'])
+        for move in moves:
+            lines_by_qty[move.product_uom_qty] |= move.move_line_ids
+        for qty_done, move_lines in lines_by_qty.items():
+            move_lines.write({'qty_done': qty_done})
+
+    @api.model
+    def _repzo_create_returns(self, lines):
+        """Return the delivered products of ``[{order_id, product_id,
+        quantity}]`` and return the ids of the created return pickings.
+
+        Each quantity is spread over the done deliveries of its order
+        product, every affected picking gets one return; any line that
+        cannot be returned fails the whole batch.
+        """
+        orders = self.browse({line['order_id'] for line in lines}).exists()
+        missing = {line['order_id'] for line in lines} - set(orders.ids)
+        if missing:
+            raise ValueError("Unknown order id(s): %s." % sorted(missing))
+
+        # what each done delivery move can still return, net of the returns
+        # already made (done or in progress)
+        moves_by_product, returnable = defaultdict(list), {}
+        for picking in orders.picking_ids:
+            if picking.state != 'done' or picking.picking_type_code != 'outgoing':
+                continue
+            for move in picking.move_ids_without_package:
+                if move.state == 'done':
+                    moves_by_product[picking.sale_id.id, move.product_id.id].append(move)
+                    returnable[move.id] = move.quantity_done - sum(
+                        returned.product_uom_qty for returned in move.returned_move_ids
+                        if returned.state != 'cancel')
+
+        qty_by_move = defaultdict(float)
+        for line in lines:
+            remaining = line['quantity']
+            for move in moves_by_product[line['order_id'], line['product_id']]:
+                qty = min(remaining, returnable[move.id] - qty_by_move[move.id])
+                if qty > 0:
+                    qty_by_move[move.id] += qty
+                    remaining -= qty
+            if remaining > 0:
+                raise ValueError(
+                    "Product %s of order %s: cannot return %s more than delivered "
+                    "and not yet returned."
+                    % (line['product_id'], line['order_id'], remaining))
+
+        with self.env.cr.savepoint():
+            return self._repzo_return_moves(qty_by_move)
+
+    @api.model
+    def _repzo_return_moves(self, qty_by_move):
+        """Create one return per picking of the ``{move_id: quantity}`` to
+        send back and return their ids; the other moves are not returned."""
+        moves = self.env['stock.move'].browse(list(qty_by_move))
+        return_pickings = []
+        for picking in moves.picking_id:
+            return_wizard = self.env['stock.return.picking'].with_context(
+                active_id=picking.id, active_ids=[picking.id]
+            ).create({})
+            for return_move in return_wizard.product_return_moves:
+                return_move.quantity = qty_by_move.get(return_move.move_id.id, 0)
+
+            return_picking = return_wizard.create_returns()
+            return_pickings.append(return_picking.get('res_id'))
+        return return_pickings
+
+    @api.model
+    def _repzo_invoiceable(self, order_ids=None, domain=None):
+        """Orders of ``order_ids`` or ``domain`` waiting for an invoice,
+        ordered by invoiced partner."""
+        if not order_ids and not domain:
+            raise ValueError("Either order ids or a domain is required.")
+        domain = [('id', 'in', order_ids)] if order_ids else list(domain)
+        return self.search(
+            expression.AND([domain, [('invoice_status', '=', 'to invoice')]]),
+            order='partner_invoice_id, id')
+
+    def _repzo_invoice_chunks(self, chunk_size):
+        """Split the orders in chunks of about ``chunk_size`` that never
+        split the orders of a partner, so each one gets a single invoice."""
+        chunk_ids, partner = [], None
+        for order in self:  # ordered by partner
+            if len(chunk_ids) >= chunk_size and order.partner_invoice_id != partner:
+                yield self.browse(chunk_ids)
+                chunk_ids = []
+            chunk_ids.append(order.id)
+            partner = order.partner_invoice_id
+        if chunk_ids:
+            yield self.browse(chunk_ids)
@@ -0,0 +1,42 @@
+from datetime import timedelta
+from odoo import models, fields, api
+
+# How long deletions are kept for clients that sync incrementally
+TOMBSTONE_RETENTION_DAYS = 30
+
+
+class RepzoTombstone(models.Model):
+    _name = 'repzo.tombstone'
+    _description = 'Repzo Deleted Record'
+    _order = 'id'
+
+    res_model = fields.Char(string="Model", required=True, index=True)
+    res_id = fields.Integer(string="Record Id", required=True)
+    id_repzo = fields.Char(string="Repzo Id")
+    reason = fields.Selection([
+        ('deleted', 'Deleted'),
+        ('archived', 'Archived'),
+    ], string="Reason", required=True)
+
+    @api.model
+    def _record(self, records, reason):
+        has_repzo_id = 'id_repzo' in records._fields
+        return self.sudo().create([{
+            'res_model': records._name,
+            'res_id': record.id,
+            'id_repzo': record.id_repzo if has_repzo_id else False,
+            'reason': reason,
+        } for record in records])
+
+    @api.model
+    def _forget(self, records):
+        # restored records are sent as regular changes again
+        self.sudo().search([
+            ('res_model', '=', records._name),
+            ('res_id', 'in', records.ids),
+        ]).unlink()
+
+    @api.autovacuum
+    def _gc_tombstones(self):
+        limit = fields.Datetime.now() - timedelta(days=TOMBSTONE_RETENTION_DAYS)
+        self.sudo().search([('create_date', '<', limit)]).unlink()
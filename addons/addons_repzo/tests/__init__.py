@@ -0,0 +1,4 @@
+from . import test_product_sort
+from . import test_product_variants
+from . import test_order_invoice
+from . import test_product_image
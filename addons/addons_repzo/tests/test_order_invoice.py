@@ -0,0 +1,84 @@
+import logging
+
+from odoo.tests import TransactionCase, tagged
+
+_logger = logging.getLogger(__name__)
+
+# Queries an order line may add to the whole chain (create, confirm,
+# assign, button_validate, invoice, post). Stock quants are updated per
+# product, everything else of the chain is grouped and should not grow.
+PER_LINE_QUERIES = 15
+
+
+@tagged('post_install', '-at_install')
+class TestOrderInvoice(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.partner = cls.env['res.partner'].create({'name': 'Repzo customer'})
+        cls.products = cls.env['product.product'].create([{
+            'name': 'Repzo product %s' % i,
+            'detailed_type': 'product',
+            'invoice_policy': 'delivery',
+        } for i in range(100)])
+        stock = cls.env['stock.warehouse'].search(
+            [('company_id', '=', cls.env.company.id)], limit=1).lot_stock_id
+        for product in cls.products:
+            cls.env['stock.quant']._update_available_quantity(product, stock, 10)
+
+    def _payload(self, size):
+        return {
+            'partner_id': self.partner.id,
+            'order_line': [{'product_id': product.id, 'quantity': 2, 'price_unit': 5.0}
+                           for product in self.products[:size]],
+        }
+
+    def _fill_qty_done_query_count(self, size):
+        order = self.env['sale.order'].create({
+            'partner_id': self.partner.id,
+            'order_line': [(0, 0, {'product_id': product.id, 'product_uom_qty': 2})
+                           for product in self.products[:size]],
+        })
+        order.action_confirm()
+        order.picking_ids.action_assign()
+        moves = order.picking_ids.move_ids_without_package
+        self.env.flush_all()
+        self.env.invalidate_all()
+
+        count = self.env.cr.sql_log_count
+        self.env['sale.order']._repzo_fill_qty_done(moves)
+        self.env.flush_all()
+        count = self.env.cr.sql_log_count - count
+
+        self.assertEqual(moves.move_line_ids.mapped('qty_done'), [2.0] * size)
+        return count
+
+    def test_fill_qty_done_query_count(self):
+        # grouped writes: the same queries for 10 lines as for 100
+        self.assertEqual(self._fill_qty_done_query_count(10),
+                         self._fill_qty_done_query_count(100))
+
+    def _order_with_invoice_query_count(self, size):
+        self.env.flush_all()
+        self.env.invalidate_all()
+        count = self.env.cr.sql_log_count
+        result = self.env['sale.order']._repzo_create_with_invoice(self._payload(size))
+        self.env.flush_all()
+        count = self.env.cr.sql_log_count - count
+
+        self.assertEqual(result['status'], 'success')
+        order = self.env['sale.order'].browse(result['order_id'])
+        self.assertEqual(set(order.picking_ids.mapped('state')), {'done'})
+        invoice = self.env['account.move'].browse(result['invoice_id'])
+        self.assertEqual(invoice.state, 'posted')
+        self.assertEqual(len(invoice.invoice_line_ids), size)
+        return count
+
+    def test_order_with_invoice_100_lines(self):
+        count_10 = self._order_with_invoice_query_count(10)
+        count_100 = self._order_with_invoice_query_count(100)
+        _logger.info("order delivered and invoiced in %d queries for 10 lines, "
+                     "%d for 100", count_10, count_100)
+        self.assertLessEqual(count_100 - count_10, 90 * PER_LINE_QUERIES,
+                             "the order chain makes per-line queries")
@@ -0,0 +1,140 @@
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from collections import Counter
+import io
+import threading
+
+from PIL import Image
+
+from odoo import fields
+from odoo.tests import HttpCase, tagged
+from odoo.addons.addons_repzo.models.product_image import MAX_ATTEMPTS
+
+
+def _png():
+    content = io.BytesIO()
+    Image.new('RGB', (4, 4), 'red').save(content, 'PNG')
+    return content.getvalue()
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    # served contents and number of requests by path, set on the server
+    def do_GET(self):
+        self.server.hits[self.path] += 1
+        content = self.server.contents.get(self.path)
+        if content is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@tagged('post_install', '-at_install')
+class TestProductImageQueue(HttpCase):
+    """The download queue against a local HTTP stub server."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.stub = ThreadingHTTPServer(('127.0.0.1', 0), _StubHandler)
+        cls.stub.contents = dict.fromkeys(['/a.png', '/b.png'], _png())
+        cls.stub.hits = Counter()
+        threading.Thread(target=cls.stub.serve_forever, daemon=True).start()
+        cls.addClassCleanup(cls.stub.server_close)
+        cls.addClassCleanup(cls.stub.shutdown)
+
+    def setUp(self):
+        super().setUp()
+        self.stub.hits.clear()
+        self.Queue = self.env['repzo.product.image']
+        # the queue of the other tests and of the database is left alone
+        self.Queue.search([('state', '=', 'pending')]).write({'state': 'done'})
+
+    def _url(self, path):
+        return 'http://127.0.0.1:%s%s' % (self.stub.server_address[1], path)
+
+    def _templates(self, count):
+        return self.env['product.template'].create([
+            {'name': 'Image test %s' % i} for i in range(count)])
+
+    def _process(self):
+        """Run the queue, return the image writes: ``[template ids]``."""
+        writes = []
+        ProductTemplate = type(self.env['product.template'])
+        origin_write = ProductTemplate.write
+
+        def write(records, vals):
+            if 'image_1920' in vals:
+                writes.append(records.ids)
+            return origin_write(records, vals)
+
+        with patch.object(ProductTemplate, 'write', write):
+            self.Queue._process_queue()
+        return writes
+
+    def test_shared_url(self):
+        templates = self._templates(2)
+        jobs = self.Queue._enqueue({template.id: self._url('/a.png') for template in templates})
+
+        writes = self._process()
+
+        self.assertEqual(self.stub.hits['/a.png'], 1, "one download per URL")
+        self.assertEqual(writes, [templates.ids], "one write for both products")
+        self.assertEqual(set(jobs.mapped('state')), {'done'})
+        self.assertTrue(all(templates.mapped('image_1920')))
+
+    def test_identical_contents(self):
+        templates = self._templates(2)
+        jobs = self.Queue._enqueue({
+            templates[0].id: self._url('/a.png'),
+            templates[1].id: self._url('/b.png'),
+        })
+
+        writes = self._process()
+
+        self.assertEqual((self.stub.hits['/a.png'], self.stub.hits['/b.png']), (1, 1))
+        self.assertEqual(len(set(jobs.mapped('content_hash'))), 1)
+        self.assertEqual(writes, [templates.ids], "one write per content")
+
+    def test_not_found_backoff(self):
+        template = self._templates(1)
+        job = self.Queue._enqueue({template.id: self._url('/missing.png')})
+
+        self._process()
+        self.assertEqual((job.state, job.attempts), ('pending', 1))
+        self.assertGreater(job.next_attempt, fields.Datetime.now())
+        first_delay = job.next_attempt - fields.Datetime.now()
+
+        # not retried before its next attempt
+        self._process()
+        self.assertEqual(self.stub.hits['/missing.png'], 1)
+
+        for attempt in range(2, MAX_ATTEMPTS + 1):
+            job.next_attempt = fields.Datetime.now() - timedelta(seconds=1)
+            self._process()
+            self.assertEqual(job.attempts, attempt)
+            if attempt == 2:
+                self.assertGreater(job.next_attempt - fields.Datetime.now(), first_delay)
+        self.assertEqual(job.state, 'failed')
+        self.assertEqual(self.stub.hits['/missing.png'], MAX_ATTEMPTS)
+        self.assertFalse(template.image_1920)
+
+    def test_status_endpoint(self):
+        template = self._templates(1)
+        self.Queue._enqueue({template.id: self._url('/a.png')})
+        self._process()
+
+        response = self.opener.get(
+            self.base_url() + '/api/get_product_image_status/%s' % template.id,
+            json={'jsonrpc': '2.0', 'method': 'call', 'params': {}}, timeout=10)
+        data = response.json()['result']['data']
+        self.assertEqual(data['state'], 'done')
+        self.assertEqual(data['attempts'], 0)
+        self.assertEqual(data['url'], self._url('/a.png'))
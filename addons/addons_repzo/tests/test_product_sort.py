@@ -0,0 +1,78 @@
+import logging
+import os
+
+from odoo.tests import TransactionCase, tagged
+from odoo.addons.addons_repzo.controllers.product import PRODUCT_SORT_KEYS
+
+_logger = logging.getLogger(__name__)
+
+CATALOG_SIZE = int(os.environ.get('REPZO_BENCH_PRODUCTS', 20000))
+PER_PAGE = 50
+OFFSET = 1000
+
+
+@tagged('post_install', '-at_install', '-standard', 'repzo_benchmark')
+class TestProductSortPlans(TransactionCase):
+    """Plans of sorted product list pages on a synthetic catalog, with and
+    without the sort indexes. Run with ``--test-tags repzo_benchmark``, the
+    catalog size is read from ``REPZO_BENCH_PRODUCTS``."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.categories = cls.env['product.category'].create([
+            {'name': 'Benchmark %s' % i} for i in range(20)])
+        for start in range(0, CATALOG_SIZE, 1000):
+            cls.env['product.template'].create([{
+                'name': 'Benchmark product %06d' % (i * 7919 % CATALOG_SIZE),
+                'list_price': i * 37 % 1000,
+                'categ_id': cls.categories[i % len(cls.categories)].id,
+            } for i in range(start, min(start + 1000, CATALOG_SIZE))])
+        cls.env.flush_all()
+        cls.env.cr.execute("ANALYZE product_template")
+        cls.env.cr.execute("ANALYZE product_product")
+
+    def _explain(self, domain, order, categ_id=None):
+        query = self.env['product.product']._template_sorted_query(
+            domain, order, offset=OFFSET, limit=PER_PAGE, categ_id=categ_id)
+        query_str, params = query.select()
+        self.env.cr.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + query_str, params)
+        return self.env.cr.fetchone()[0][0]
+
+    def _index_names(self, node):
+        names = {node['Index Name']} if 'Index Name' in node else set()
+        for child in node.get('Plans', []):
+            names |= self._index_names(child)
+        return names
+
+    def test_sorted_pages_use_indexes(self):
+        self.env.cr.execute("""
+            SELECT indexname FROM pg_indexes
+             WHERE tablename = 'product_template'
+               AND indexname LIKE 'product_template_repzo_%%'
+        """)
+        sort_indexes = {row[0] for row in self.env.cr.fetchall()}
+        self.assertTrue(sort_indexes)
+
+        for key in ('name', 'price'):
+            order = '{} asc, id asc'.format(PRODUCT_SORT_KEYS[key])
+            for categ_id in (None, self.categories[0].id):
+                domain = [('categ_id', '=', categ_id)] if categ_id else []
+                with_indexes = self._explain(domain, order, categ_id)
+
+                self.env.cr.execute("SAVEPOINT repzo_benchmark")
+                for indexname in sort_indexes:
+                    self.env.cr.execute('DROP INDEX "%s"' % indexname)
+                without_indexes = self._explain(domain, order, categ_id)
+                self.env.cr.execute("ROLLBACK TO SAVEPOINT repzo_benchmark")
+
+                _logger.info(
+                    "sort=%s domain=%s on %d products: %.2f ms with the sort "
+                    "indexes (%s), %.2f ms without (%s)", key, domain, CATALOG_SIZE,
+                    with_indexes['Execution Time'],
+                    ', '.join(sorted(self._index_names(with_indexes['Plan']))),
+                    without_indexes['Execution Time'],
+                    ', '.join(sorted(self._index_names(without_indexes['Plan']))))
+                self.assertTrue(
+                    self._index_names(with_indexes['Plan']) & sort_indexes,
+                    "sort=%s domain=%s does not use a sort index" % (key, domain))
@@ -0,0 +1,32 @@
+from odoo.tests import TransactionCase, tagged
+from odoo.addons.addons_repzo.controllers.serializers import product_serializer
+
+
+@tagged('post_install', '-at_install')
+class TestDefaultVariants(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.templates = cls.env['product.template'].create([
+            {'name': 'Variant test %s' % i} for i in range(200)])
+
+    def _page_query_count(self, per_page):
+        """Queries made to serialize a page of ``per_page`` products with
+        their default variant, as /api/get_all_products does."""
+        products = self.templates[:per_page].product_variant_ids
+        self.env.flush_all()
+        self.env.invalidate_all()
+        count = self.env.cr.sql_log_count
+        product_serializer.dump(products)
+        products.product_tmpl_id._default_variant_ids()
+        return self.env.cr.sql_log_count - count
+
+    def test_default_variant_ids(self):
+        default_variants = self.templates._default_variant_ids()
+        self.assertEqual(default_variants, {
+            template.id: template.product_variant_ids[:1].id
+            for template in self.templates})
+
+    def test_query_count_independent_of_page_size(self):
+        self.assertEqual(self._page_query_count(10), self._page_query_count(200))